@@ -3,6 +3,11 @@ from dash import dash, Dash, callback, Output, Input, State
 import dash_bootstrap_components as dbc
 from dash_iconify import DashIconify
 
+import metrics
+import profiling
+import scoreboard_db
+import scoreboard_events
+
 # App config
 theme = dbc.themes.BOOTSTRAP
 icon_lib = dbc.icons.FONT_AWESOME
@@ -14,6 +19,10 @@ app = Dash(
     use_pages=True,
     suppress_callback_exceptions=True,
 )
+scoreboard_events.init_app(app.server)
+metrics.init_app(app)
+profiling.init_app(app)
+scoreboard_db.start_compaction()
 
 # App layout
 app.layout = dbc.Container(fluid=True, children=[
@@ -0,0 +1,126 @@
+// Clientside callbacks of the game. render_prompt draws the current prompt in every game mode. The
+// others belong to the client game mode (MATHSPRINT_GAME_MODE=client): the countdown and the first
+// check of each answer run in the browser, and the server only refills the rolling window of
+// upcoming prompts and re-verifies the answer log when the game is submitted.
+(function () {
+    // Matches GAME_DURATION in pages/home.py
+    var GAME_DURATION = 60;
+
+    // Milliseconds after which a refill that did not arrive, e.g. refused or dropped, is requested again
+    var REFILL_TIMEOUT = 3000;
+
+    function bootstrapComponent(type, props) {
+        return {type: type, namespace: 'dash_bootstrap_components', props: props};
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        game: {
+            check_answer: function (n_submit, value, store, batch, log) {
+                var noUpdate = window.dash_clientside.no_update;
+                if (!store || !store.token || !batch || !batch.answers) {
+                    throw window.dash_clientside.PreventUpdate;
+                }
+
+                // Waiting for the next batch of prompts
+                var index = store.cursor - batch.offset;
+                if (index < 0 || index >= batch.answers.length) {
+                    throw window.dash_clientside.PreventUpdate;
+                }
+
+                store = Object.assign({}, store);
+                log = (log || []).concat([value]);
+
+                // Answered wrongly
+                if (value !== batch.answers[index]) {
+                    store.score -= 1;
+                    return [
+                        store, log, noUpdate, value, false, true, 'Score: ' + store.score, noUpdate,
+                    ];
+                }
+
+                // Answered correctly
+                store.cursor += 1;
+                store.score += 1;
+                var next = store.cursor - batch.offset;
+                if (store.cursor >= batch.size) {
+                    store.finished = true;
+                } else if (next >= batch.prompts.length) {
+                    // Answered faster than the window was refilled, show_waiting_prompt catches up
+                    store.waiting = true;
+                }
+
+                // Refill the window in the background once it runs low, once per window end
+                var request = noUpdate;
+                var end = batch.offset + batch.prompts.length;
+                if (end < batch.size && end - store.cursor <= batch.low_watermark &&
+                    store.requested !== end) {
+                    store.requested = end;
+                    request = {cursor: store.cursor, start: end, requested_at: Date.now()};
+                }
+                return [
+                    store, log, request, '', true, false, 'Score: ' + store.score,
+                    batch.prompts[next] || '',
+                ];
+            },
+
+            // Requests the refill of the window again while it has not arrived within REFILL_TIMEOUT,
+            // as check_answer requests each window end only once and cannot while waiting for it
+            retry_refill: function (n_intervals, request, store, batch) {
+                if (!store || !store.token || !request || !batch || !batch.prompts ||
+                    store.finished || request.start !== store.requested) {
+                    throw window.dash_clientside.PreventUpdate;
+                }
+                var end = batch.offset + batch.prompts.length;
+                if (end !== request.start || Date.now() - request.requested_at < REFILL_TIMEOUT) {
+                    throw window.dash_clientside.PreventUpdate;
+                }
+                return {cursor: store.cursor, start: end, requested_at: Date.now()};
+            },
+
+            show_waiting_prompt: function (batch, store) {
+                if (!store || !store.waiting || !batch || !batch.prompts) {
+                    throw window.dash_clientside.PreventUpdate;
+                }
+                var index = store.cursor - batch.offset;
+                if (index < 0 || index >= batch.prompts.length) {
+                    throw window.dash_clientside.PreventUpdate;
+                }
+                store = Object.assign({}, store, {waiting: false});
+                return [store, batch.prompts[index]];
+            },
+
+            // Renders the string form of a prompt, e.g. '12x7-3', as a row of operand and operator cards
+            render_prompt: function (prompt) {
+                var tokens = (prompt || '').match(/\d+|\D/g) || [];
+                var cards = tokens.map(function (item, i) {
+                    return bootstrapComponent('Col', {
+                        children: bootstrapComponent('Card', {
+                            class_name: i % 2 === 0 ? 'operand-card' : 'operator-card',
+                            children: bootstrapComponent('CardBody', {children: item}),
+                        }),
+                    });
+                });
+                return bootstrapComponent('Row', {children: cards});
+            },
+
+            update_timer: function (n_intervals) {
+                return (GAME_DURATION - n_intervals) + ' seconds left';
+            },
+
+            end_game: function (n_intervals, n_clicks, store, log, submission) {
+                if (!store || !store.token || (submission && submission.token === store.token)) {
+                    throw window.dash_clientside.PreventUpdate;
+                }
+
+                var triggered = window.dash_clientside.callback_context.triggered.map(function (t) {
+                    return t.prop_id;
+                });
+                if (n_intervals >= GAME_DURATION || store.finished ||
+                    triggered.indexOf('btn_endgame.n_clicks') !== -1) {
+                    return {token: store.token, log: log || []};
+                }
+                throw window.dash_clientside.PreventUpdate;
+            },
+        },
+    });
+})();
@@ -0,0 +1,30 @@
+// Listens to the scoreboard event stream while the scoreboard page is shown and clicks its hidden
+// refresh button whenever the server pushes a change, instead of polling the server every second.
+(function () {
+    var source = null;
+
+    function clickRefresh() {
+        var button = document.getElementById('btn_scoreboard_refresh');
+        if (button) {
+            button.click();
+        }
+    }
+
+    function syncEventSource() {
+        var onScoreboard = document.getElementById('btn_scoreboard_refresh') !== null;
+        if (onScoreboard && source === null) {
+            source = new EventSource('/scoreboard/events');
+            source.addEventListener('scores', clickRefresh);
+        } else if (!onScoreboard && source !== null) {
+            source.close();
+            source = null;
+        }
+    }
+
+    // Dash pages swap layouts client side, so follow the page content as it changes
+    new MutationObserver(syncEventSource).observe(document.documentElement, {
+        childList: true,
+        subtree: true,
+    });
+    syncEventSource();
+})();
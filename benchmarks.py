@@ -0,0 +1,164 @@
+# Micro-benchmarks of the page helpers: generate_prompts for every difficulty and operator, and
+# create_scoreboard and create_statistic over synthetic scoreboards, e.g.
+#   python benchmarks.py --json bench.json
+#   python benchmarks.py --rows 1000 100000 --json new.json --compare bench.json
+# Synthetic scoreboards are SQLite databases kept in --data-dir, so large ones are built only once.
+
+# Import libraries
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import tracemalloc
+from statistics import median
+
+import numpy as np
+import pandas as pd
+
+# Benchmarks run against synthetic databases only, so the real scoreboard and its compacted history
+# are replaced by paths in an empty directory
+_unused_dir = tempfile.mkdtemp(prefix='mathsprint_bench_')
+os.environ['MATHSPRINT_SCOREBOARD_DB'] = os.path.join(_unused_dir, 'mathsprint_scoreboard.db')
+os.environ['MATHSPRINT_SCOREBOARD_HISTORY'] = os.path.join(_unused_dir, 'mathsprint_scoreboard_history.db')
+
+import app  # Pages can only be imported once the Dash app exists
+import scoreboard_db
+from scoreboard_db import CATEGORIES, SCOREBOARD_COLUMNS
+from scoreboard_db.sqlite_engine import SQLiteEngine
+from prompt_engine import NORMAL_GRIDS
+from pages.home import generate_prompts
+from pages.scoreboard import create_scoreboard, create_statistic
+
+DEFAULT_ROWS = [1000, 100000, 10000000]
+INSERT_CHUNK = 100000
+
+# Helper functions
+def measure(func, repeat: int) -> dict:
+    """
+    Times repeat calls of func and then measures the peak memory allocated by one more call.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'seconds_median': median(times), 'seconds_min': min(times), 'repeat': repeat, 'peak_bytes': peak}
+
+def synthetic_engine(rows: int, data_dir: str) -> SQLiteEngine:
+    """
+    Returns an engine over a scoreboard of rows random games, built in data_dir on first use.
+    Rowids are assigned in order, so the last rowid of a complete build is rows and a build that
+    was interrupted is started over.
+    """
+    path = os.path.join(data_dir, f'mathsprint_bench_{rows}.db')
+    engine = SQLiteEngine(path)
+    if engine.version()[1] == rows:
+        return engine
+    engine.write(pd.DataFrame(columns=SCOREBOARD_COLUMNS))
+
+    rng = np.random.default_rng(rows)
+    for start in range(0, rows, INSERT_CHUNK):
+        count = min(INSERT_CHUNK, rows - start)
+        categories = rng.integers(0, len(CATEGORIES), count)
+        scores = np.clip(rng.normal(20, 10, count), -30, 120).astype(int)
+        users = rng.integers(0, 10000, count)
+        days = rng.integers(0, 365, count)
+        engine.append([
+            {
+                'timestamp': str(np.datetime64('2024-01-01') + day),
+                'username': f'user{user}',
+                'difficulty': CATEGORIES[category][0],
+                'operator': CATEGORIES[category][1],
+                'score': int(score),
+            }
+            for category, score, user, day in zip(categories.tolist(), scores.tolist(), users.tolist(), days.tolist())
+        ])
+    return engine
+
+# Benchmarks
+def bench_prompts(repeat: int) -> list[dict]:
+    results = []
+    decks = [('Normal', operator) for operator in NORMAL_GRIDS] + [('Hard', 'Addition')]
+    for difficulty, operator in decks:
+        stats = measure(lambda: generate_prompts(operator, difficulty, seed=1), repeat)
+        results.append({'name': 'generate_prompts', 'params': {'difficulty': difficulty, 'operator': operator}, **stats})
+    return results
+
+def bench_scoreboard(rows: int, repeat: int, data_dir: str) -> list[dict]:
+    """
+    Times both builders with cold caches, i.e. right after the scoreboard changed under them, and
+    with warm ones.
+    """
+    engine = synthetic_engine(rows, data_dir)
+    results = []
+    for name, builder in [('create_scoreboard', create_scoreboard), ('create_statistic', create_statistic)]:
+        for difficulty, operator in [('Normal', 'Addition'), ('Hard', 'Invalid')]:
+            def cold() -> None:
+                scoreboard_db.set_engine(engine)
+                builder(difficulty, operator)
+
+            params = {'rows': rows, 'difficulty': difficulty, 'operator': operator}
+            results.append({'name': f'{name} cold', 'params': params, **measure(cold, repeat)})
+            results.append({
+                'name': f'{name} warm', 'params': params,
+                **measure(lambda: builder(difficulty, operator), repeat),
+            })
+    return results
+
+def compare(results: list[dict], baseline: list[dict]) -> None:
+    """
+    Prints the median time of every benchmark relative to the same benchmark of a baseline run.
+    """
+    key = lambda result: (result['name'], json.dumps(result['params'], sort_keys=True))
+    previous = {key(result): result for result in baseline}
+    for result in results:
+        base = previous.get(key(result))
+        if base:
+            ratio = result['seconds_median'] / base['seconds_median']
+            print(f"{result['name']:<24}{json.dumps(result['params']):<70}{ratio:>8.2f}x")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark the MathSprint page helpers.')
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS, help='Synthetic scoreboard sizes')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed calls per benchmark')
+    parser.add_argument('--data-dir', default=tempfile.gettempdir(), help='Directory of synthetic scoreboards')
+    parser.add_argument('--json', help='Write the results as JSON to this file')
+    parser.add_argument('--compare', help='JSON results of a previous run to compare against')
+    args = parser.parse_args()
+    os.makedirs(args.data_dir, exist_ok=True)
+
+    results = bench_prompts(args.repeat)
+    for rows in args.rows:
+        results += bench_scoreboard(rows, args.repeat, args.data_dir)
+
+    print(f"{'benchmark':<24}{'params':<70}{'median ms':>10}{'min ms':>10}{'peak KiB':>10}")
+    for result in results:
+        print(
+            f"{result['name']:<24}{json.dumps(result['params']):<70}"
+            f"{result['seconds_median'] * 1000:>10.2f}{result['seconds_min'] * 1000:>10.2f}"
+            f"{result['peak_bytes'] / 1024:>10.0f}"
+        )
+
+    if args.compare:
+        with open(args.compare) as file:
+            compare(results, json.load(file)['results'])
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({
+                'python': sys.version.split()[0],
+                'platform': platform.platform(),
+                'timestamp': time.time(),
+                'results': results,
+            }, file, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+# Import libraries
+import os
+import json
+import time
+import uuid
+import secrets
+import sqlite3
+import threading
+from collections import OrderedDict
+from itsdangerous import URLSafeSerializer, BadSignature
+
+# Session config
+SESSION_TTL = float(os.environ.get('MATHSPRINT_SESSION_TTL', 900))
+SESSION_BACKEND = os.environ.get('MATHSPRINT_SESSION_BACKEND', 'memory')
+SESSION_DB = os.environ.get('MATHSPRINT_SESSION_DB', 'mathsprint_sessions.db')
+
+# Key signing game tokens. Processes serving the same games must share it.
+SECRET_KEY = os.environ.get('MATHSPRINT_SECRET_KEY') or secrets.token_hex(32)
+
+# Session backends
+class MemorySessionStore:
+    """
+    In-process session store. Sessions are kept in insertion order of their last access so that
+    expired sessions can be evicted from the front without scanning every session.
+    """
+    def __init__(self, ttl: float = SESSION_TTL) -> None:
+        self.ttl = ttl
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, now: float) -> None:
+        while self._sessions:
+            session_id, (expires_at, _) = next(iter(self._sessions.items()))
+            if expires_at > now:
+                break
+            del self._sessions[session_id]
+
+    def get(self, session_id: str) -> dict | None:
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            self._sessions[session_id] = (now + self.ttl, entry[1])
+            self._sessions.move_to_end(session_id)
+            return entry[1]
+
+    def set(self, session_id: str, data: dict) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            self._sessions[session_id] = (now + self.ttl, data)
+            self._sessions.move_to_end(session_id)
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def pop(self, session_id: str) -> dict | None:
+        with self._lock:
+            self._evict(time.monotonic())
+            entry = self._sessions.pop(session_id, None)
+        return entry[1] if entry is not None else None
+
+class SQLiteSessionStore:
+    """
+    Session store backed by a local SQLite file, for deployments where sessions must outlive the
+    process or be shared between processes. Session data is stored as JSON.
+    """
+    def __init__(self, path: str = SESSION_DB, ttl: float = SESSION_TTL) -> None:
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                '''
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+                '''
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions (expires_at)')
+
+    def _connect(self) -> sqlite3.Connection:
+        # Connections are per thread and are not reused by a forked worker process
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, session_id: str) -> dict | None:
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT data FROM sessions WHERE session_id = ? AND expires_at > ?',
+                (session_id, now),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                'UPDATE sessions SET expires_at = ? WHERE session_id = ?',
+                (now + self.ttl, session_id),
+            )
+        return json.loads(row[0])
+
+    def set(self, session_id: str, data: dict) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('DELETE FROM sessions WHERE expires_at <= ?', (now,))
+            conn.execute(
+                'INSERT OR REPLACE INTO sessions (session_id, data, expires_at) VALUES (?, ?, ?)',
+                (session_id, json.dumps(data), now + self.ttl),
+            )
+
+    def delete(self, session_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute('DELETE FROM sessions WHERE session_id = ?', (session_id,))
+
+    def pop(self, session_id: str) -> dict | None:
+        # One statement, so that of concurrent pops of a session only one returns it
+        with self._connect() as conn:
+            row = conn.execute(
+                'DELETE FROM sessions WHERE session_id = ? AND expires_at > ? RETURNING data',
+                (session_id, time.time()),
+            ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+SESSION_BACKENDS = {
+    'memory': MemorySessionStore,
+    'sqlite': SQLiteSessionStore,
+}
+
+_store = None
+
+def get_session_store() -> MemorySessionStore | SQLiteSessionStore:
+    """
+    Returns the process-wide session store, created on first use from MATHSPRINT_SESSION_BACKEND.
+    """
+    global _store
+    if _store is None:
+        if SESSION_BACKEND not in SESSION_BACKENDS:
+            raise ValueError(f'Unknown session backend: {SESSION_BACKEND}')
+        _store = SESSION_BACKENDS[SESSION_BACKEND]()
+    return _store
+
+def set_session_store(store: MemorySessionStore | SQLiteSessionStore) -> None:
+    """
+    Replaces the process-wide session store, e.g. with a custom backend exposing get/set/delete/pop.
+    """
+    global _store
+    _store = store
+
+# Session helpers
+def create_session(data: dict) -> str:
+    """
+    Stores game data server side and returns the session id to be kept by the browser.
+    """
+    session_id = uuid.uuid4().hex
+    get_session_store().set(session_id, data)
+    return session_id
+
+def get_session(session_id: str | None) -> dict | None:
+    """
+    Returns game data of a session or None if the session does not exist or has expired.
+    """
+    if not session_id:
+        return None
+    return get_session_store().get(session_id)
+
+def save_session(session_id: str, data: dict) -> None:
+    """
+    Replaces the game data of a session, e.g. to record the progress of its game.
+    """
+    get_session_store().set(session_id, data)
+
+def delete_session(session_id: str | None) -> None:
+    """
+    Removes a session once its game has ended.
+    """
+    if session_id:
+        get_session_store().delete(session_id)
+
+def pop_session(session_id: str | None) -> dict | None:
+    """
+    Removes a session and returns its game data, or None if the session does not exist, has expired
+    or was already removed, e.g. by a concurrent request ending the same game.
+    """
+    if not session_id:
+        return None
+    return get_session_store().pop(session_id)
+
+def sign_game(game: dict) -> str:
+    """
+    Returns a signed token of a game, e.g. its session id, for the browser to send back with
+    requests the server must be able to trust. Tokens are signed, not encrypted, so the browser
+    can read them: anything secret, such as the seed of the deck, stays in the session.
+    """
+    return URLSafeSerializer(SECRET_KEY, salt='mathsprint-game').dumps(game)
+
+def verify_game_token(token: str | None) -> dict | None:
+    """
+    Returns the game of a token signed by sign_game, or None if the token was tampered with.
+    """
+    if not token:
+        return None
+    try:
+        return URLSafeSerializer(SECRET_KEY, salt='mathsprint-game').loads(token)
+    except BadSignature:
+        return None
@@ -0,0 +1,35 @@
+# Gunicorn config for serving wsgi:server with multiple worker processes
+import os
+import secrets
+import logging
+import tempfile
+import multiprocessing
+
+bind = os.environ.get('MATHSPRINT_BIND', '0.0.0.0:8050')
+
+# Threaded workers. Every open scoreboard event stream holds one thread of its worker, so a worker
+# keeps at most half of its threads streaming and tells further scoreboard viewers to poll instead
+worker_class = 'gthread'
+workers = int(os.environ.get('MATHSPRINT_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('MATHSPRINT_THREADS', 8))
+os.environ.setdefault('MATHSPRINT_EVENT_STREAMS', str(max(1, threads // 2)))
+
+# Event streams are long lived, idle ones send a keep-alive comment well within this timeout
+timeout = 60
+graceful_timeout = 30
+
+# State shared by workers: game sessions live in a common SQLite file and game tokens are signed
+# with a key generated once here and inherited by every worker. Leaderboards and statistics are
+# kept per worker and resynchronised through scoreboard_db versions.
+os.environ.setdefault('MATHSPRINT_SESSION_BACKEND', 'sqlite')
+os.environ.setdefault('MATHSPRINT_SECRET_KEY', secrets.token_hex(32))
+
+# Workers write their metrics to a directory created once per server, so that /metrics on any
+# worker serves the sum of every worker since the server started
+os.environ.setdefault('MATHSPRINT_METRICS_DIR', tempfile.mkdtemp(prefix='mathsprint_metrics_'))
+
+if workers > 1 and os.environ['MATHSPRINT_SESSION_BACKEND'] == 'memory':
+    logging.getLogger('gunicorn.error').warning(
+        'MATHSPRINT_SESSION_BACKEND=memory keeps game sessions per worker; use sqlite with %d workers',
+        workers,
+    )
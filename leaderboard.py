@@ -0,0 +1,69 @@
+# Import libraries
+import heapq
+import itertools
+
+import scoreboard_db
+from scoreboard_db import CATEGORIES
+
+LEADERBOARD_SIZE = 10
+
+class Leaderboard:
+    """
+    Top scores of a category kept in a bounded min-heap, so a new score is ranked in O(log k)
+    against the lowest score on the board. Among equal scores the earlier one keeps its place.
+    """
+    def __init__(self, size: int = LEADERBOARD_SIZE) -> None:
+        self.size = size
+        self._heap = []
+        self._sequence = itertools.count()
+        self._top = []
+
+    def push(self, record: dict) -> None:
+        """
+        Adds a record to the leaderboard if its score ranks within the top scores.
+        """
+        entry = (record['score'], -next(self._sequence), record)
+        if len(self._heap) < self.size:
+            heapq.heappush(self._heap, entry)
+        elif entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+        else:
+            return
+        self._top = [entry[2] for entry in sorted(self._heap, key=lambda entry: entry[:2], reverse=True)]
+
+    def top(self) -> list[dict]:
+        """
+        Returns the records of the leaderboard sorted by descending score.
+        """
+        return self._top
+
+def _seed() -> dict:
+    """
+    Seeds the leaderboard of every category from scoreboard_db.
+    """
+    leaderboards = {}
+    for difficulty, operator in CATEGORIES:
+        leaderboard = Leaderboard()
+        df_top = scoreboard_db.get_top_scores(difficulty, operator, LEADERBOARD_SIZE)
+        for record in df_top.to_dict('records'):
+            leaderboard.push(record)
+        leaderboards[(difficulty, operator)] = leaderboard
+    return leaderboards
+
+def _update(leaderboards: dict, records: list[dict]) -> None:
+    """
+    Ranks newly recorded scores.
+    """
+    for record in records:
+        leaderboard = leaderboards.get((record['difficulty'], record['operator']))
+        if leaderboard is not None:
+            leaderboard.push(record)
+
+_leaderboards = scoreboard_db.ScoreAggregate(_seed, _update)
+
+def get_leaderboard(difficulty: str, operator: str) -> list[dict]:
+    """
+    Returns the top scores of a category sorted by descending score. Leaderboards are seeded from
+    scoreboard_db on first use and kept up to date as scores are recorded.
+    """
+    return _leaderboards.get()[(difficulty, operator)].top()
@@ -0,0 +1,378 @@
+# Load test of the Dash callbacks: simulated players and scoreboard viewers drive the real
+# /_dash-update-component endpoint of a running server, e.g.
+#   python loadtest.py --start --players 50 --viewers 10 --duration 60
+#   python loadtest.py --url http://127.0.0.1:8050 --players 20 --json loadtest.json
+# Games played by the simulated players are recorded like any other, so point --url at a staging
+# server or use --start, which serves the app from temporary databases of every engine.
+
+# Import libraries
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import subprocess
+from collections import defaultdict
+
+import requests
+
+UPDATE_PATH = '/_dash-update-component'
+
+# Server callbacks driven by the load test, as (output, input) identifying them in /_dash-dependencies
+CALLBACKS = {
+    'start_game': ('container_start.style', 'btn_start'),
+    'handle_ans': ('store_game.data', 'input_ans'),
+    'handle_timer': ('label_timer.children', 'interval_timer'),
+    'handle_end_game': ('label_finalscore.children', 'btn_endgame'),
+    'fetch_prompts': ('store_batch.data', 'store_batch_request'),
+    'submit_game': ('label_finalscore.children', 'store_submission'),
+    'handle_update_data': ('store_scoreboard_versions.data', 'btn_scoreboard_refresh'),
+}
+
+CATEGORIES = [
+    ('Normal', 'Addition'), ('Normal', 'Subtraction'), ('Normal', 'Multiplication'),
+    ('Normal', 'Division'), ('Hard', 'Addition'),
+]
+
+# Helper functions
+def find_callbacks(dependencies: list) -> dict:
+    """
+    Maps the name of every server callback in CALLBACKS that the app registers to its dependency.
+    Clientside callbacks are skipped, so the names found tell which game mode the server runs.
+    """
+    found = {}
+    for name, (output, input_id) in CALLBACKS.items():
+        for dependency in dependencies:
+            if dependency.get('clientside_function'):
+                continue
+            if output in dependency['output'] and any(i['id'] == input_id for i in dependency['inputs']):
+                found[name] = dependency
+                break
+    return found
+
+def parse_outputs(output: str) -> list[dict]:
+    """
+    Splits the output string of a dependency into the output list of an update request.
+    """
+    parts = output[2:-2].split('...') if output.startswith('..') else [output]
+    outputs = []
+    for part in parts:
+        component_id, prop = part.rsplit('.', 1)
+        outputs.append({'id': component_id, 'property': prop.split('@')[0]})
+    return outputs
+
+def solve(prompt: str) -> int:
+    """
+    Computes the answer of the string form of a prompt, e.g. '45+5x10'.
+    """
+    if not re.fullmatch(r'\d+([-+x/]\d+)*', prompt):
+        raise ValueError(f'Not a prompt: {prompt!r}')
+    return eval(prompt.replace('x', '*').replace('/', '//'))
+
+def percentile(values: list, q: float) -> float:
+    """
+    Returns the q-quantile of values using the nearest rank.
+    """
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+class Recorder:
+    """
+    Collects latency, payload sizes and status of every callback request, per callback.
+    """
+    def __init__(self) -> None:
+        self.latencies = defaultdict(list)
+        self.request_bytes = defaultdict(int)
+        self.response_bytes = defaultdict(int)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, name: str, latency: float, request_bytes: int, response_bytes: int, ok: bool) -> None:
+        with self._lock:
+            self.latencies[name].append(latency)
+            self.request_bytes[name] += request_bytes
+            self.response_bytes[name] += response_bytes
+            if not ok:
+                self.errors[name] += 1
+
+    def report(self, elapsed: float) -> dict:
+        """
+        Returns per callback request counts, requests per second, p50/p95/p99 latency in
+        milliseconds, mean payload bytes and errors, plus totals.
+        """
+        callbacks = {}
+        with self._lock:
+            for name, latencies in sorted(self.latencies.items()):
+                count = len(latencies)
+                callbacks[name] = {
+                    'requests': count,
+                    'rps': count / elapsed,
+                    'p50_ms': percentile(latencies, 0.50) * 1000,
+                    'p95_ms': percentile(latencies, 0.95) * 1000,
+                    'p99_ms': percentile(latencies, 0.99) * 1000,
+                    'request_bytes': self.request_bytes[name] / count,
+                    'response_bytes': self.response_bytes[name] / count,
+                    'errors': self.errors[name],
+                }
+        total = sum(stats['requests'] for stats in callbacks.values())
+        return {'elapsed': elapsed, 'requests': total, 'rps': total / elapsed, 'callbacks': callbacks}
+
+class DashClient:
+    """
+    Calls the server callbacks of the app like the Dash renderer of one browser does.
+    """
+    def __init__(self, url: str, callbacks: dict, recorder: Recorder) -> None:
+        self.url = url
+        self.callbacks = callbacks
+        self.recorder = recorder
+        self.session = requests.Session()
+
+    def call(self, name: str, inputs: list, state: list = (), triggered: str | None = None) -> dict | None:
+        """
+        Calls a callback with input and state values in the order of its dependency. Returns the
+        response of each output by component id, or None if the callback did not update.
+        """
+        dependency = self.callbacks[name]
+        outputs = parse_outputs(dependency['output'])
+        if triggered is None:
+            triggered = f"{dependency['inputs'][0]['id']}.{dependency['inputs'][0]['property']}"
+        body = json.dumps({
+            'output': dependency['output'],
+            'outputs': outputs if len(outputs) > 1 else outputs[0],
+            'inputs': [dict(i, value=value) for i, value in zip(dependency['inputs'], inputs)],
+            'state': [dict(s, value=value) for s, value in zip(dependency['state'], state)],
+            'changedPropIds': [triggered],
+        })
+
+        # Idle keep-alive connections may be closed by the server just as they are reused, in which
+        # case the request is sent again like a browser does
+        for attempt in range(2):
+            start = time.perf_counter()
+            try:
+                response = self.session.post(
+                    self.url + UPDATE_PATH, data=body, headers={'Content-Type': 'application/json'}
+                )
+                break
+            except requests.ConnectionError:
+                if attempt:
+                    raise
+        latency = time.perf_counter() - start
+        self.recorder.record(name, latency, len(body), len(response.content), response.status_code in (200, 204))
+
+        if response.status_code != 200:
+            return None
+        return {
+            component_id: props[next(iter(props))]
+            for component_id, props in response.json()['response'].items()
+        }
+
+# Simulated users
+def play(client: DashClient, player: int, args: argparse.Namespace, deadline: float) -> None:
+    """
+    Plays games back to back until the deadline, answering with a think time of args.think seconds
+    on average and a wrong answer at args.error_rate.
+    """
+    brand = [{'props': {'children': f'Welcome to MathSprint, loadtest{player}!'}}]
+    server_mode = 'handle_ans' in client.callbacks
+    rng = random.Random(player)
+
+    while time.time() < deadline:
+        difficulty, operator = rng.choice(CATEGORIES)
+        response = client.call('start_game', [1], [{}, difficulty, operator])
+        if response is None:
+            return
+        store = response['store_game']
+        prompt, batch = response['store_prompt'], response['store_batch']
+        log = []
+        requested = None
+        game_end = min(deadline, time.time() + args.game_duration)
+        next_tick = time.time() + 1
+        ticks = 0
+        ended = False
+
+        while time.time() < game_end:
+            time.sleep(min(rng.expovariate(1 / args.think) if args.think else 0, max(0, game_end - time.time())))
+
+            # Timer ticks of the browser, which are server callbacks in server mode
+            while server_mode and time.time() >= next_tick:
+                ticks += 1
+                next_tick += 1
+                client.call('handle_timer', [ticks])
+                ended = client.call('handle_end_game', [ticks, None], [store, brand]) is not None
+                if ended:
+                    break
+
+            if ended:
+                break
+            if server_mode:
+                answer = solve(prompt) if prompt else 0
+                if rng.random() < args.error_rate:
+                    answer += 1
+                response = client.call('handle_ans', [len(log) + 1], [answer, store])
+                log.append(answer)
+                if response is not None:
+                    store = response['store_game']
+                    prompt = response.get('store_prompt', prompt)
+                continue
+
+            # Client mode refills the prompt window like assets/game.js, and asks again on the next
+            # answer if a refill did not update it rather than waiting for prompts forever
+            end = batch['offset'] + len(batch['prompts'])
+            if end < batch['size'] and end - store['cursor'] <= batch['low_watermark'] and requested != end:
+                requested = end
+                response = client.call('fetch_prompts', [{'cursor': store['cursor'], 'start': end}], [store, batch])
+                if response is None:
+                    requested = None
+                else:
+                    batch = response['store_batch']
+
+            # Answers from the prompt window
+            index = store['cursor'] - batch['offset']
+            if index >= len(batch['answers']):
+                if store['cursor'] >= batch['size']:
+                    break
+                continue
+            answer = batch['answers'][index]
+            if rng.random() < args.error_rate:
+                answer += 1
+            log.append(answer)
+            if answer == batch['answers'][index]:
+                store['cursor'] += 1
+
+        # End of game, unless the timer already ended it
+        if server_mode:
+            if not ended:
+                client.call('handle_end_game', [ticks, 1], [store, brand], triggered='btn_endgame.n_clicks')
+        else:
+            client.call('submit_game', [{'token': store['token'], 'log': log}], [brand])
+
+def view(client: DashClient, args: argparse.Namespace, deadline: float) -> None:
+    """
+    Keeps the scoreboard page open until the deadline, refreshing it every args.view_interval
+    seconds as if the server had pushed a change.
+    """
+    versions = {}
+    clicks = 0
+    while time.time() < deadline:
+        response = client.call('handle_update_data', [clicks], [versions])
+        if response is not None:
+            versions = response['store_scoreboard_versions']
+        clicks += 1
+        time.sleep(args.view_interval)
+
+# Load test
+def start_server(args: argparse.Namespace, data_dir: str) -> subprocess.Popen:
+    """
+    Starts the app under gunicorn with databases in data_dir and waits until it serves requests.
+    Every scoreboard file of every engine, the compacted history and the legacy csv are placed in
+    data_dir, so the games played never reach the real scoreboard whichever engine is selected.
+    """
+    root = os.path.dirname(os.path.abspath(__file__))
+    env = dict(
+        os.environ,
+        MATHSPRINT_BIND=args.url.split('://', 1)[1],
+        MATHSPRINT_WORKERS=str(args.workers),
+        MATHSPRINT_SESSION_BACKEND='sqlite',
+        MATHSPRINT_SESSION_DB=os.path.join(data_dir, 'mathsprint_sessions.db'),
+        MATHSPRINT_SCOREBOARD_CSV=os.path.join(data_dir, 'mathsprint_scoreboard.csv'),
+        MATHSPRINT_SCOREBOARD_DB=os.path.join(data_dir, 'mathsprint_scoreboard.db'),
+        MATHSPRINT_SCOREBOARD_PARQUET=os.path.join(data_dir, 'mathsprint_scoreboard.parquet'),
+        MATHSPRINT_SCOREBOARD_LOG=os.path.join(data_dir, 'mathsprint_scoreboard.log'),
+        MATHSPRINT_SCOREBOARD_PARTITIONS=os.path.join(data_dir, 'mathsprint_scoreboard_partitions'),
+        MATHSPRINT_SCOREBOARD_HISTORY=os.path.join(data_dir, 'mathsprint_scoreboard_history.db'),
+    )
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', 'wsgi:server'],
+        cwd=root, env=env,
+    )
+    for _ in range(300):
+        if server.poll() is not None:
+            break
+        try:
+            requests.get(args.url + '/_dash-layout', timeout=10)
+            return server
+        except requests.RequestException:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError(f'Server did not start on {args.url}')
+
+def run(args: argparse.Namespace) -> dict:
+    """
+    Runs args.players players and args.viewers viewers against the server for args.duration seconds.
+    """
+    dependencies = requests.get(args.url + '/_dash-dependencies').json()
+    callbacks = find_callbacks(dependencies)
+    recorder = Recorder()
+
+    deadline = time.time() + args.duration
+    threads = [
+        threading.Thread(target=play, args=(DashClient(args.url, callbacks, recorder), player, args, deadline))
+        for player in range(args.players)
+    ] + [
+        threading.Thread(target=view, args=(DashClient(args.url, callbacks, recorder), args, deadline))
+        for _ in range(args.viewers)
+    ]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    report = recorder.report(time.time() - start)
+    report['mode'] = 'server' if 'handle_ans' in callbacks else 'client'
+    report['players'] = args.players
+    report['viewers'] = args.viewers
+    return report
+
+def print_report(report: dict) -> None:
+    print(
+        f"{report['players']} players, {report['viewers']} viewers, {report['mode']} game mode: "
+        f"{report['requests']} requests in {report['elapsed']:.1f} s, {report['rps']:.1f} requests/s"
+    )
+    header = f"{'callback':<20}{'requests':>10}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}" \
+        f"{'req B':>9}{'resp B':>9}{'errors':>8}"
+    print(header)
+    for name, stats in report['callbacks'].items():
+        print(
+            f"{name:<20}{stats['requests']:>10}{stats['rps']:>9.1f}{stats['p50_ms']:>9.1f}"
+            f"{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}{stats['request_bytes']:>9.0f}"
+            f"{stats['response_bytes']:>9.0f}{stats['errors']:>8}"
+        )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Load test the MathSprint callbacks.')
+    parser.add_argument('--url', default='http://127.0.0.1:8050', help='Server to test')
+    parser.add_argument('--start', action='store_true', help='Start the server at --url with temporary databases')
+    parser.add_argument('--workers', type=int, default=4, help='Gunicorn workers of a server started with --start')
+    parser.add_argument('--players', type=int, default=20, help='Concurrent players')
+    parser.add_argument('--viewers', type=int, default=5, help='Concurrent scoreboard viewers')
+    parser.add_argument('--duration', type=float, default=60, help='Seconds to run')
+    parser.add_argument('--game-duration', type=float, default=60, help='Seconds per game')
+    parser.add_argument('--think', type=float, default=1.0, help='Mean seconds between answers')
+    parser.add_argument('--error-rate', type=float, default=0.1, help='Fraction of wrong answers')
+    parser.add_argument('--view-interval', type=float, default=2.0, help='Seconds between scoreboard refreshes')
+    parser.add_argument('--json', help='Also write the report as JSON to this file')
+    args = parser.parse_args()
+
+    server = None
+    with tempfile.TemporaryDirectory() as data_dir:
+        if args.start:
+            server = start_server(args, data_dir)
+        try:
+            report = run(args)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(report, file, indent=2)
+
+if __name__ == '__main__':
+    main()
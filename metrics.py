@@ -0,0 +1,315 @@
+# Import libraries
+import os
+import json
+import time
+import uuid
+import atexit
+import random
+import logging
+import threading
+from contextlib import contextmanager
+
+from flask import Response, request
+from dash import Dash
+
+METRICS_PATH = '/metrics'
+UPDATE_PATH = '/_dash-update-component'
+
+# Fraction of callback requests and events that are logged
+LOG_SAMPLE_RATE = float(os.environ.get('MATHSPRINT_LOG_SAMPLE_RATE', 0.01))
+
+# Directory shared by the processes of one server, e.g. gunicorn workers, where each writes its
+# metrics every METRICS_WRITE_INTERVAL seconds so that any of them serves the sum of all
+METRICS_DIR = os.environ.get('MATHSPRINT_METRICS_DIR')
+METRICS_WRITE_INTERVAL = 5.0
+
+# Histogram buckets of durations in seconds and payload sizes in bytes
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+# Callback label of requests whose output matches no callback
+UNKNOWN_CALLBACK = 'unknown'
+
+logger = logging.getLogger('mathsprint')
+
+def escape_label(value: str) -> str:
+    """
+    Escapes a label value for the Prometheus text format.
+    """
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class Histogram:
+    """
+    Cumulative histogram per label value, e.g. per callback, in the Prometheus text format.
+    """
+    def __init__(self, name: str, description: str, label: str, buckets: tuple) -> None:
+        self.name = name
+        self.description = description
+        self.label = label
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value: str, value: float) -> None:
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * len(self.buckets), 0, 0.0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            series[1] += 1
+            series[2] += value
+
+    def snapshot(self) -> dict:
+        """
+        Returns the series of this process as JSON serialisable data.
+        """
+        with self._lock:
+            return {label_value: [list(counts), count, total] for label_value, (counts, count, total) in self._series.items()}
+
+    def expose(self, snapshots: list[dict]) -> list[str]:
+        """
+        Returns the sum of snapshots, e.g. of every process, in the Prometheus text format.
+        """
+        series = {}
+        for snapshot in snapshots:
+            for label_value, (counts, count, total) in snapshot.items():
+                merged = series.setdefault(label_value, [[0] * len(self.buckets), 0, 0.0])
+                merged[0] = [merged_count + bucket_count for merged_count, bucket_count in zip(merged[0], counts)]
+                merged[1] += count
+                merged[2] += total
+
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        for label_value, (counts, count, total) in sorted(series.items()):
+            label = f'{self.label}="{escape_label(label_value)}"'
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {bucket_count}')
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{label}}} {total}')
+            lines.append(f'{self.name}_count{{{label}}} {count}')
+        return lines
+
+class Counter:
+    """
+    Counter per pair of label values in the Prometheus text format.
+    """
+    def __init__(self, name: str, description: str, labels: tuple[str, str]) -> None:
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_values: tuple[str, str]) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + 1
+
+    def snapshot(self) -> list:
+        """
+        Returns the values of this process as JSON serialisable data.
+        """
+        with self._lock:
+            return [[list(label_values), value] for label_values, value in self._values.items()]
+
+    def expose(self, snapshots: list[list]) -> list[str]:
+        """
+        Returns the sum of snapshots, e.g. of every process, in the Prometheus text format.
+        """
+        values = {}
+        for snapshot in snapshots:
+            for label_values, value in snapshot:
+                values[tuple(label_values)] = values.get(tuple(label_values), 0) + value
+
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} counter']
+        for label_values, value in sorted(values.items()):
+            labels = ','.join(f'{label}="{escape_label(value)}"' for label, value in zip(self.labels, label_values))
+            lines.append(f'{self.name}{{{labels}}} {value}')
+        return lines
+
+callback_duration = Histogram(
+    'mathsprint_callback_duration_seconds', 'Wall time of Dash callback requests.', 'callback', DURATION_BUCKETS
+)
+callback_request_bytes = Histogram(
+    'mathsprint_callback_request_bytes', 'Size of serialised callback requests.', 'callback', SIZE_BUCKETS
+)
+callback_response_bytes = Histogram(
+    'mathsprint_callback_response_bytes', 'Size of serialised callback responses.', 'callback', SIZE_BUCKETS
+)
+callback_db_duration = Histogram(
+    'mathsprint_callback_db_seconds', 'Time callback requests spent in scoreboard_db I/O.', 'callback', DURATION_BUCKETS
+)
+callback_requests = Counter(
+    'mathsprint_callback_requests_total', 'Dash callback requests by HTTP status.', ('callback', 'status')
+)
+db_duration = Histogram(
+    'mathsprint_scoreboard_db_seconds', 'Time spent in scoreboard_db I/O by operation.', 'operation', DURATION_BUCKETS
+)
+METRICS = [
+    callback_duration, callback_request_bytes, callback_response_bytes, callback_db_duration,
+    callback_requests, db_duration,
+]
+
+# Callback request served by the current thread
+_request_state = threading.local()
+
+# Callback function names by output string
+_callback_names = {}
+
+# Snapshot file of this process in METRICS_DIR, named uniquely so that a worker never takes over the
+# file of an earlier one that had the same pid
+_snapshot_path = None
+_snapshot_pid = None
+_snapshot_lock = threading.Lock()
+
+# Helper functions
+@contextmanager
+def db_timer(operation: str):
+    """
+    Times a scoreboard_db operation, and adds its time to the callback request being served.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        db_duration.observe(operation, elapsed)
+        if getattr(_request_state, 'db_seconds', None) is not None:
+            _request_state.db_seconds += elapsed
+
+def get_callback_name(app: Dash, output: str) -> str:
+    """
+    Returns the function name of the callback of an output string of a callback request, or
+    UNKNOWN_CALLBACK for an output of no callback so that clients cannot add metric series.
+    """
+    if not isinstance(output, str):
+        return UNKNOWN_CALLBACK
+    name = _callback_names.get(output)
+    if name is None:
+        func = app.callback_map.get(output, {}).get('callback')
+        if func is None:
+            return UNKNOWN_CALLBACK
+        name = _callback_names[output] = func.__name__
+    return name
+
+def log_event(event: str, **fields) -> None:
+    """
+    Logs an event with its fields as one JSON line, for a LOG_SAMPLE_RATE fraction of calls.
+    """
+    if random.random() < LOG_SAMPLE_RATE:
+        logger.info(json.dumps({'event': event, **fields}, default=str))
+
+def write_snapshot() -> None:
+    """
+    Replaces the snapshot file of this process in METRICS_DIR with its current metrics.
+    """
+    snapshot = {metric.name: metric.snapshot() for metric in METRICS}
+    tmp_path = _snapshot_path + '.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump(snapshot, file)
+    os.replace(tmp_path, _snapshot_path)
+
+def _write_snapshots() -> None:
+    while True:
+        time.sleep(METRICS_WRITE_INTERVAL)
+        try:
+            write_snapshot()
+        except OSError:
+            logger.exception('Failed to write metrics snapshot')
+
+def start_snapshots() -> None:
+    """
+    Starts writing the metrics of this process to METRICS_DIR from a background thread, and once
+    more at exit, if METRICS_DIR is set. Does nothing if it already runs in this process.
+    """
+    global _snapshot_path, _snapshot_pid
+    if METRICS_DIR is None or _snapshot_pid == os.getpid():
+        return
+    with _snapshot_lock:
+        if _snapshot_pid == os.getpid():
+            return
+        _snapshot_pid = os.getpid()
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        _snapshot_path = os.path.join(METRICS_DIR, f'metrics-{os.getpid()}-{uuid.uuid4().hex[:8]}.json')
+        threading.Thread(target=_write_snapshots, name='metrics-snapshots', daemon=True).start()
+        atexit.register(write_snapshot)
+
+def read_snapshots() -> list[dict]:
+    """
+    Returns the metrics of this process and the last snapshot of every other process in
+    METRICS_DIR, including processes that have exited, so that counters never go backwards.
+    """
+    snapshots = [{metric.name: metric.snapshot() for metric in METRICS}]
+    if METRICS_DIR is None or not os.path.isdir(METRICS_DIR):
+        return snapshots
+    own = os.path.basename(_snapshot_path) if _snapshot_path is not None else None
+    for name in os.listdir(METRICS_DIR):
+        if not name.startswith('metrics-') or not name.endswith('.json') or name == own:
+            continue
+        try:
+            with open(os.path.join(METRICS_DIR, name)) as file:
+                snapshots.append(json.load(file))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+def expose() -> str:
+    """
+    Returns every metric in the Prometheus text exposition format, summed over every process
+    writing to METRICS_DIR if set, or of this process only otherwise.
+    """
+    snapshots = read_snapshots()
+    lines = []
+    for metric in METRICS:
+        lines += metric.expose([snapshot[metric.name] for snapshot in snapshots if metric.name in snapshot])
+    return '\n'.join(lines) + '\n'
+
+def init_app(app: Dash) -> None:
+    """
+    Instruments every callback of a Dash app: wall time, request and response size and
+    scoreboard_db time of each callback request are recorded and served on METRICS_PATH. Metrics
+    are kept per process and, with METRICS_DIR set, shared through it, so that a scrape served by
+    any worker sees the sum of every worker.
+    """
+    server = app.server
+    if not logger.handlers:
+        logger.addHandler(logging.StreamHandler())
+        logger.setLevel(logging.INFO)
+
+    @server.before_request
+    def start_callback_timer() -> None:
+        # Workers may be forked after the app was set up, so each starts its own writer
+        start_snapshots()
+        if request.path == UPDATE_PATH:
+            _request_state.start = time.perf_counter()
+            _request_state.db_seconds = 0.0
+
+    @server.after_request
+    def record_callback(response: Response) -> Response:
+        if request.path != UPDATE_PATH or getattr(_request_state, 'db_seconds', None) is None:
+            return response
+
+        elapsed = time.perf_counter() - _request_state.start
+        db_seconds = _request_state.db_seconds
+        _request_state.db_seconds = None
+
+        body = request.get_json(silent=True) or {}
+        name = get_callback_name(app, body.get('output', ''))
+        request_bytes = request.content_length or 0
+        response_bytes = response.calculate_content_length() or 0
+        callback_duration.observe(name, elapsed)
+        callback_request_bytes.observe(name, request_bytes)
+        callback_response_bytes.observe(name, response_bytes)
+        callback_db_duration.observe(name, db_seconds)
+        callback_requests.inc((name, str(response.status_code)))
+        log_event(
+            'callback', callback=name, status=response.status_code, seconds=round(elapsed, 6),
+            db_seconds=round(db_seconds, 6), request_bytes=request_bytes, response_bytes=response_bytes,
+        )
+        return response
+
+    def metrics() -> Response:
+        return Response(expose(), mimetype='text/plain; version=0.0.4')
+
+    server.add_url_rule(METRICS_PATH, 'metrics', metrics)
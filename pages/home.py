@@ -1,95 +1,108 @@
 # Import libraries
-import random
+import os
+import time
 import datetime
-import pandas as pd
 
 import dash
-from dash import dcc, callback, Output, Input, State, callback_context, no_update
+from dash import dcc, callback, clientside_callback, ClientsideFunction
+from dash import Output, Input, State, callback_context, no_update
+from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
 
-from scoreboard_db import get_scoreboard, write_scoreboard
+from scoreboard_db import record_score
+from game_session import create_session, get_session, save_session, delete_session, pop_session, sign_game, verify_game_token
+from prompt_engine import new_seed, deck_size, get_prompt, get_prompts, generate_deck, to_prompt
 
 dash.register_page(__name__, path='/')
 
+# Game config
+# In client mode the countdown and answer checks run in the browser (assets/game.js), which keeps
+# a rolling window of upcoming prompts, refills it in the background when it runs low and submits
+# its answer log for the server to re-verify when the game ends. In server mode every answer and
+# timer tick is a server callback.
+GAME_MODE = os.environ.get('MATHSPRINT_GAME_MODE', 'client')
+GAME_DURATION = 60
+BATCH_SIZE = 20
+LOW_WATERMARK = 5
+SUBMIT_GRACE = 30
+
+# Answers per second of play counted from a submitted answer log, well above a human's pace
+MAX_ANSWER_RATE = 5
+
 # Helper functions
+def game_callback(mode: str, *args, **kwargs):
+    """
+    Registers a callback only when the game runs in the given mode.
+    """
+    if GAME_MODE != mode:
+        return lambda func: func
+    return callback(*args, **kwargs)
+
 def generate_prompts(
-    operator: str='Multiplication', difficulty: str='Normal'
+    operator: str='Multiplication', difficulty: str='Normal', seed: int | None = None,
+    size: int | None = None,
 ) -> tuple[list, list]:
     """
-    Generates math prompts and answers based on difficulty and operator. Then, prompts and
-    answers are shuffled. Normal prompts consists of 2 operands and 1 operator.
-    Hard prompts consist of 3 operands and 2 operators (+ or - and * or /).
+    Generates the full shuffled deck of math prompts and answers based on difficulty and operator.
+    Games draw prompts lazily from prompt_engine instead; this materialises a whole deck, e.g. for export.
     Inputs:
         operator (str): Addition, Subtraction, Multiplication, Division
         difficulty (str): Normal, Hard
+        seed (int): Seed of the shuffle, a random seed is used if not given
+        size (int): Number of prompts of a hard deck, HARD_DECK_SIZE if not given
     """
-    prompts = []
-    answers = []
+    if seed is None:
+        seed = new_seed()
 
-    if difficulty == 'Normal':
-        if 'Multiplication' == operator:
-            for i in range(0, 13):
-                for j in range(0, 13):
-                    prompts.append([i, 'x', j])
-                    answers.append(i * j)
-
-        elif 'Addition' == operator:
-            for i in range(1, 101):
-                for j in range(1, 101):
-                    prompts.append([i, '+', j])
-                    answers.append(i + j)
-
-        elif 'Subtraction' == operator:
-            for i in range(1, 101):
-                for j in range(1, 101):
-                    prompts.append([i, '-', j])
-                    answers.append(i - j)
-
-        elif 'Division' == operator:
-            for i in range(0, 13):
-                for j in range(1, 13):
-                    prompts.append([i * j, '/', j])
-                    answers.append(i)
+    operands, operators, answers = generate_deck(operator, difficulty, seed, size)
+    prompts = [to_prompt(row, codes) for row, codes in zip(operands, operators)]
+    return prompts, answers.tolist()
 
-    elif difficulty == 'Hard':
-        for i in range(1000):
-            # Generate 3 random operands
-            i, j, k = random.randint(0, 12), random.randint(0, 12), random.randint(1, 100)
-            
-            # Generates random operator between * and /
-            if random.randint(0, 1):
-                prompt = [i, 'x', j]
-                answer = i * j
-            else:
-                if j == 0:
-                    continue
-                prompt = [i * j, '/', j]
-                answer = i
-
-            # Generates random operator between + and - and its relative position
-            if random.randint(0, 1):
-                if random.randint(0, 1):
-                    prompt += ['+', k]
-                else:
-                    prompt = [k, '+'] + prompt
-                answer += k
-            else:
-                if random.randint(0, 1):
-                    prompt += ['-', k]
-                    answer -= k
-                else:
-                    prompt = [k, '-'] + prompt
-                    answer = k - answer
-                
-            prompts.append(prompt)
-            answers.append(answer)
-    
-    # Randomly shuffles prompts and answers
-    zipped = list(zip(prompts, answers))
-    random.shuffle(zipped)
-    prompts, answers = zip(*zipped)
+def prompts_exhausted(store: dict) -> bool:
+    """
+    Checks whether every prompt of the game session referenced by the store has been answered.
+    """
+    session = get_session(store.get('session_id'))
+    if session is None:
+        return False
+    return store['cursor'] >= deck_size(session['operator'], session['difficulty'])
 
-    return list(prompts), list(answers)
+def get_prompt_batch(operator: str, difficulty: str, seed: int, start: int) -> dict:
+    """
+    Returns up to BATCH_SIZE prompts and answers of a deck starting at index start, for the
+    browser to check answers without a server round trip. The browser asks for the next batch
+    once LOW_WATERMARK or fewer of its prompts are left unanswered.
+    """
+    operands, operators, answers = get_prompts(operator, difficulty, seed, start, start + BATCH_SIZE)
+    prompts = [str(to_prompt(row, codes)) for row, codes in zip(operands, operators)]
+    return {
+        'offset': start, 'size': deck_size(operator, difficulty), 'prompts': prompts,
+        'answers': answers.tolist(),
+        'low_watermark': LOW_WATERMARK,
+    }
+
+def score_answer_log(operator: str, difficulty: str, seed: int, log: list, served: int, max_answers: int) -> int:
+    """
+    Replays the answers submitted by the browser against the deck of the game and returns the
+    resulting score: +1 and the next prompt for a correct answer, -1 for a wrong one. Only the
+    first max_answers answers count, and the replay stops at the first of the served prompts
+    never sent to the browser, as no genuine answer can reach it.
+    """
+    log = log[:max_answers]
+
+    # The cursor advances at most once per answer, so the log can only reach its first len(log) prompts
+    answers = get_prompts(operator, difficulty, seed, 0, min(len(log), served))[2].tolist()
+    cursor = 0
+    score = 0
+    for value in log:
+        if cursor >= len(answers):
+            break
+        if value == answers[cursor]:
+            cursor += 1
+            score += 1
+        else:
+            score -= 1
+    return score
 
 # Page layout
 layout = dbc.Container(fluid=True, children=[
@@ -282,116 +295,13 @@ layout = dbc.Container(fluid=True, children=[
                             ],
                         ),
 
+                        # Math prompt, rendered from store_prompt by assets/game.js
                         dbc.Row(
                             children=[
-
-                                # Normal math prompts
-                                dbc.Container(
-                                    id='math_prompt_normal',
-                                    children=[
-                                        dbc.Row([
-
-                                            dbc.Col(
-                                                dbc.Card(
-                                                    dbc.CardBody(
-                                                        '',
-                                                        id='normal_operand_1',
-                                                        
-                                                    ),
-                                                    class_name='operand-card',
-                                                )
-                                            ),
-
-                                            dbc.Col(
-                                                dbc.Card(
-                                                    dbc.CardBody(
-                                                        '',
-                                                        id='normal_operator_1',
-                                                    ),
-                                                    class_name='operator-card',
-                                                )
-                                            ),
-
-                                            dbc.Col(
-                                                dbc.Card(
-                                                    dbc.CardBody(
-                                                        '',
-                                                        id='normal_operand_2',
-                                                    ),
-                                                    class_name='operand-card',
-                                                )
-                                            ),
-
-                                        ])
-                                    ],
-                                    style={
-                                        'display': 'none',
-                                    },
-                                ),
-
-                                # Hard math prompts
                                 dbc.Container(
-                                    id='math_prompt_hard',
-                                    children=[
-                                        dbc.Row([
-
-                                            dbc.Col(
-                                                dbc.Card(
-                                                    dbc.CardBody(
-                                                        '',
-                                                        id='hard_operand_1',
-                                                    ),
-                                                    class_name='operand-card',
-                                                )
-                                            ),
-
-                                            dbc.Col(
-                                                dbc.Card(
-                                                    dbc.CardBody(
-                                                        '',
-                                                        id='hard_operator_1',
-                                                    ),
-                                                    class_name='operator-card',
-                                                )
-                                            ),
-
-                                            dbc.Col(
-                                                dbc.Card(
-                                                    dbc.CardBody(
-                                                        '',
-                                                        id='hard_operand_2',
-                                                    ),
-                                                    class_name='operand-card',
-                                                )
-                                            ),
-
-                                            dbc.Col(
-                                                dbc.Card(
-                                                    dbc.CardBody(
-                                                        '',
-                                                        id='hard_operator_2',
-                                                    ),
-                                                    class_name='operator-card',
-                                                )
-                                            ),
-
-                                            dbc.Col(
-                                                dbc.Card(
-                                                    dbc.CardBody(
-                                                        '',
-                                                        id='hard_operand_3',
-                                                    ),
-                                                    class_name='operand-card',
-                                                )
-                                            ),
-
-                                        ])
-                                    ],
-                                    style={
-                                        'display': 'none',
-                                    },
+                                    id='math_prompt',
+                                    children=[],
                                 ),
-
                             ],
                         ),
 
@@ -560,6 +470,13 @@ layout = dbc.Container(fluid=True, children=[
         data={},
     ),
 
+    # Client game mode stores
+    dcc.Store(id='store_prompt', data=''),
+    dcc.Store(id='store_batch', data={}),
+    dcc.Store(id='store_batch_request', data={}),
+    dcc.Store(id='store_log', data=[]),
+    dcc.Store(id='store_submission', data={}),
+
 ])
 
 # Callback functions
@@ -569,19 +486,9 @@ layout = dbc.Container(fluid=True, children=[
     Output('store_game', 'data', allow_duplicate=True),
     Output('interval_timer', 'n_intervals'),
     Output('label_score', 'children', allow_duplicate=True),
-
-    Output('math_prompt_normal', 'style', allow_duplicate=True),
-    Output('math_prompt_hard', 'style', allow_duplicate=True),
-
-    Output('normal_operand_1', 'children', allow_duplicate=True),
-    Output('normal_operator_1', 'children', allow_duplicate=True),
-    Output('normal_operand_2', 'children', allow_duplicate=True),
-
-    Output('hard_operand_1', 'children', allow_duplicate=True),
-    Output('hard_operator_1', 'children', allow_duplicate=True),
-    Output('hard_operand_2', 'children', allow_duplicate=True),
-    Output('hard_operator_2', 'children', allow_duplicate=True),
-    Output('hard_operand_3', 'children', allow_duplicate=True),
+    Output('store_prompt', 'data', allow_duplicate=True),
+    Output('store_batch', 'data', allow_duplicate=True),
+    Output('store_log', 'data', allow_duplicate=True),
 
     Input('btn_start', 'n_clicks'),
     State('store_game', 'data'),
@@ -594,117 +501,85 @@ def start_game(
     n_start: int, store: dict, difficulty: str, operator: str
 ) -> list[dict, dict, dict, str, int]:
     """
-    Starts game by generating prompts and answers and storing them in dcc store.
+    Starts game by drawing a seed for the shuffled deck and storing the game in a server side
+    session. The browser only keeps the session id, the cursor of the current prompt and the score.
     Displays the first prompt.
     """
-    # Generate prompts and answers
-    prompts, answers = generate_prompts(operator=operator, difficulty=difficulty)
-    first_prompt = prompts.pop(0)
-
-    # Initialize store
-    store['prompts'] = prompts
-    store['answers'] = answers
-    store['score'] = 0
-
-    # Checks which card display to show
-    if difficulty == 'Normal':
-        return [
-            {'display':' none'}, {'display':' block'}, store, 0, 'Score: 0',
-            {'display':' block'}, {'display':' none'},
-            first_prompt[0], first_prompt[1], first_prompt[2],
-            '', '', '', '', ''
-        ]
+    # Initialize session and store
+    seed = new_seed()
+    delete_session(store.get('session_id'))
+    game = {'operator': operator, 'difficulty': difficulty, 'seed': seed, 'started_at': time.time()}
+
+    # Client mode checks answers in the browser from batches of prompts, and the session records
+    # how many prompts were served so that answers to any others are rejected
+    batch = {}
+    if GAME_MODE == 'client':
+        batch = get_prompt_batch(operator, difficulty, seed, 0)
+        game['served'] = len(batch['prompts'])
+
+    session_id = create_session(game)
+    store = {
+        'session_id': session_id,
+        'cursor': 0,
+        'score': 0,
+    }
+    if GAME_MODE == 'client':
+        store['token'] = sign_game({'session_id': session_id})
+    first_prompt, _ = get_prompt(operator, difficulty, seed, 0)
 
-    else:
-        return [
-            {'display':' none'}, {'display':' block'}, store, 0, 'Score: 0',
-            {'display':' none'}, {'display':' block'},
-            '', '', '',
-            first_prompt[0], first_prompt[1], first_prompt[2], first_prompt[3], first_prompt[4]
-        ] 
+    return [
+        {'display':' none'}, {'display':' block'}, store, 0, 'Score: 0', str(first_prompt), batch, [],
+    ]
 
-@callback(
+@game_callback(
+    'server',
     Output('store_game', 'data', allow_duplicate=True),
     Output('input_ans', 'value', allow_duplicate=True),
     Output('alert_correct', 'is_open'),
     Output('alert_wrong', 'is_open'),
     Output('label_score', 'children', allow_duplicate=True),
-
-    Output('normal_operand_1', 'children', allow_duplicate=True),
-    Output('normal_operator_1', 'children', allow_duplicate=True),
-    Output('normal_operand_2', 'children', allow_duplicate=True),
-
-    Output('hard_operand_1', 'children', allow_duplicate=True),
-    Output('hard_operator_1', 'children', allow_duplicate=True),
-    Output('hard_operand_2', 'children', allow_duplicate=True),
-    Output('hard_operator_2', 'children', allow_duplicate=True),
-    Output('hard_operand_3', 'children', allow_duplicate=True),
+    Output('store_prompt', 'data', allow_duplicate=True),
 
     Input('input_ans', 'n_submit'),
     State('input_ans', 'value'),
     State('store_game', 'data'),
-    State('select_difficulty', 'value'),
-
-    State('normal_operand_1', 'children'),
-    State('normal_operator_1', 'children'),
-    State('normal_operand_2', 'children'),
-
-    State('hard_operand_1', 'children'),
-    State('hard_operator_1', 'children'),
-    State('hard_operand_2', 'children'),
-    State('hard_operator_2', 'children'),
-    State('hard_operand_3', 'children'),
 
     prevent_initial_call=True,
 )
 def handle_ans(
-    n_submit: int, input_ans: int, store: dict, difficulty: str,
-    n_operand_1: str, n_operator_1: str, n_operand_2: str,
-    h_operand_1: str, h_operator_1: str, h_operand_2: str, h_operator_2: str, h_operand_3: str,
-) -> list[dbc.Label, dict, str, bool, bool, str]:
+    n_submit: int, input_ans: int, store: dict
+) -> list[dict, str, bool, bool, str, list]:
     """
     Handles user input of answer, triggered when user types results and hits enter key. 
     Increment score if correct and decrement score if wrong and displays appropriate alert.
     If answered correctly, check whether there are more prompts.
     """
-    curr_ans = store['answers'][0]
+    session = get_session(store.get('session_id'))
+    if session is None:
+        raise PreventUpdate
+    operator, difficulty, seed = session['operator'], session['difficulty'], session['seed']
+    _, curr_ans = get_prompt(operator, difficulty, seed, store['cursor'])
 
     # Answered correctly
     if curr_ans == input_ans:
-        # There are more prompts
-        next_prompt = dbc.Label('')
-        if store['prompts'] != []:
-            next_prompt = store['prompts'][0]
-            store['prompts'] = store['prompts'][1:]
-
-        store['answers'] = store['answers'][1:]
+        store['cursor'] += 1
         store['score'] += 1
 
-        # Checks which card display to show
-        if difficulty == 'Normal':
-            return [
-                store, '', True, False, f'Score: {store["score"]}',
-                next_prompt[0], next_prompt[1], next_prompt[2],
-                '', '', '', '', ''
-            ]
-        else:
-            return [
-                store, '', True, False, f'Score: {store["score"]}',
-                '', '', '',
-                next_prompt[0], next_prompt[1], next_prompt[2], next_prompt[3], next_prompt[4]
-            ]
+        # There are more prompts
+        next_prompt = ''
+        if store['cursor'] < deck_size(operator, difficulty):
+            next_prompt = str(get_prompt(operator, difficulty, seed, store['cursor'])[0])
+
+        return [store, '', True, False, f'Score: {store["score"]}', next_prompt]
 
     # Answered wrongly
     else:
         store['score'] -= 1
 
-        return [
-            store, input_ans, False, True, f'Score: {store["score"]}',
-            n_operand_1, n_operator_1, n_operand_2,
-            h_operand_1, h_operator_1, h_operand_2, h_operator_2, h_operand_3,
-        ]
+        return [store, input_ans, False, True, f'Score: {store["score"]}', no_update]
 
-@callback(
+@game_callback(
+    'server',
     Output('label_timer', 'children'),
     Input('interval_timer', 'n_intervals'),
 )
@@ -712,9 +587,10 @@ def handle_timer(n_interval: int) -> str:
     """
     Changes 1 minute timer display of game.
     """
-    return f'{60 - n_interval} seconds left'
+    return f'{GAME_DURATION - n_interval} seconds left'
 
-@callback(
+@game_callback(
+    'server',
     Output('container_end', 'style', allow_duplicate=True),
     Output('container_game', 'style', allow_duplicate=True),
     Output('label_finalscore', 'children'),
@@ -725,13 +601,11 @@ def handle_timer(n_interval: int) -> str:
     Input('btn_endgame', 'n_clicks'),
 
     State('navbar', 'brand'),
-    State('select_difficulty', 'value'),
-    State('select_operator', 'value'),
 
     prevent_initial_call=True,
 )
 def handle_end_game(
-    n_interval: int, store: dict, n_clicks: int, brand: dict, difficulty: str, operator: str
+    n_interval: int, store: dict, n_clicks: int, brand: dict
 ) -> tuple[dict, dict, str, str]:
     """
     Check if game ended due to 1 minute timer is up or all prompts have been answered or
@@ -739,30 +613,205 @@ def handle_end_game(
     username, difficulty and operator. The function is triggered by dcc Interval on a per second basis.
     """
     # Check if game ended due to timer or no more prompts or user clicked on end game
-    if (n_interval == 60 and 'score' in store) or \
-    store.get('answers') == [] or \
+    if (n_interval == GAME_DURATION and 'score' in store) or \
+    prompts_exhausted(store) or \
     callback_context.args_grouping[2]['triggered']:
+        # Only the request that removes the session records the game, however often it is ended
+        session = pop_session(store.get('session_id'))
+        if session is None:
+            return no_update
         score = store['score']
         store['score'] = -1
 
         # Records score into S3
         timestamp = datetime.date.today()
         username = brand[0]['props']['children'].split(' ')[3][:-1]
-        df_scoreboard = get_scoreboard()
-        df_scoreboard = pd.concat([df_scoreboard, pd.DataFrame({
-            'timestamp': [timestamp],
-            'username': [username],
-            'difficulty': [difficulty],
-            'operator': [operator] if difficulty == 'Normal' else ['Invalid'],
-            'score': [score],
-        })], axis=0, ignore_index=True)
-        write_scoreboard(df_scoreboard)
+        record_score(
+            timestamp=timestamp,
+            username=username,
+            difficulty=session['difficulty'],
+            operator=session['operator'] if session['difficulty'] == 'Normal' else 'Invalid',
+            score=score,
+        )
 
         return {'display':' block'}, {'display':' none'}, f'Your final score is {score}', ''
 
     else:
         return no_update
 
+clientside_callback(
+    ClientsideFunction(namespace='game', function_name='render_prompt'),
+
+    Output('math_prompt', 'children'),
+    Input('store_prompt', 'data'),
+)
+
+if GAME_MODE == 'client':
+    clientside_callback(
+        ClientsideFunction(namespace='game', function_name='check_answer'),
+
+        Output('store_game', 'data', allow_duplicate=True),
+        Output('store_log', 'data', allow_duplicate=True),
+        Output('store_batch_request', 'data', allow_duplicate=True),
+        Output('input_ans', 'value', allow_duplicate=True),
+        Output('alert_correct', 'is_open', allow_duplicate=True),
+        Output('alert_wrong', 'is_open', allow_duplicate=True),
+        Output('label_score', 'children', allow_duplicate=True),
+        Output('store_prompt', 'data', allow_duplicate=True),
+
+        Input('input_ans', 'n_submit'),
+        State('input_ans', 'value'),
+        State('store_game', 'data'),
+        State('store_batch', 'data'),
+        State('store_log', 'data'),
+
+        prevent_initial_call=True,
+    )
+
+    clientside_callback(
+        ClientsideFunction(namespace='game', function_name='retry_refill'),
+
+        Output('store_batch_request', 'data', allow_duplicate=True),
+
+        Input('interval_timer', 'n_intervals'),
+        State('store_batch_request', 'data'),
+        State('store_game', 'data'),
+        State('store_batch', 'data'),
+
+        prevent_initial_call=True,
+    )
+
+    clientside_callback(
+        ClientsideFunction(namespace='game', function_name='show_waiting_prompt'),
+
+        Output('store_game', 'data', allow_duplicate=True),
+        Output('store_prompt', 'data', allow_duplicate=True),
+
+        Input('store_batch', 'data'),
+        State('store_game', 'data'),
+
+        prevent_initial_call=True,
+    )
+
+    clientside_callback(
+        ClientsideFunction(namespace='game', function_name='update_timer'),
+
+        Output('label_timer', 'children'),
+        Input('interval_timer', 'n_intervals'),
+    )
+
+    clientside_callback(
+        ClientsideFunction(namespace='game', function_name='end_game'),
+
+        Output('store_submission', 'data'),
+
+        Input('interval_timer', 'n_intervals'),
+        Input('btn_endgame', 'n_clicks'),
+        Input('store_game', 'data'),
+        State('store_log', 'data'),
+        State('store_submission', 'data'),
+
+        prevent_initial_call=True,
+    )
+
+@game_callback(
+    'client',
+    Output('store_batch', 'data', allow_duplicate=True),
+
+    Input('store_batch_request', 'data'),
+    State('store_game', 'data'),
+    State('store_batch', 'data'),
+
+    prevent_initial_call=True,
+)
+def fetch_prompts(request: dict, store: dict, batch: dict) -> dict:
+    """
+    Refills the prompt window of the browser while it still has prompts left to answer. The next
+    batch, starting where the window ends, is appended to the prompts not yet answered when the
+    refill was requested, so the window stays valid while the player keeps answering. Only prompts
+    following those already served are sent, and only while the game runs.
+    """
+    game = verify_game_token(store.get('token')) if isinstance(store, dict) else None
+    session = get_session(game['session_id']) if game is not None else None
+    if session is None or not isinstance(request, dict):
+        raise PreventUpdate
+    served = session.get('served', 0)
+    cursor, start = request.get('cursor'), request.get('start')
+    if not isinstance(cursor, int) or not isinstance(start, int) or not 0 <= cursor <= start <= served:
+        raise PreventUpdate
+    if time.time() - session['started_at'] > GAME_DURATION:
+        raise PreventUpdate
+    operator, difficulty, seed = session['operator'], session['difficulty'], session['seed']
+
+    # Start over from the cursor if the current window does not line up with the request
+    batch = batch if isinstance(batch, dict) else {}
+    offset = batch.get('offset', 0)
+    keep = cursor - offset
+    if keep < 0 or offset + len(batch.get('prompts', [])) != start:
+        refill = get_prompt_batch(operator, difficulty, seed, cursor)
+    else:
+        refill = get_prompt_batch(operator, difficulty, seed, start)
+        if not refill['prompts']:
+            raise PreventUpdate
+        refill['offset'] = cursor
+        refill['prompts'] = batch['prompts'][keep:] + refill['prompts']
+        refill['answers'] = batch['answers'][keep:] + refill['answers']
+
+    if refill['offset'] + len(refill['prompts']) > served:
+        session['served'] = refill['offset'] + len(refill['prompts'])
+        save_session(game['session_id'], session)
+    return refill
+
+@game_callback(
+    'client',
+    Output('container_end', 'style', allow_duplicate=True),
+    Output('container_game', 'style', allow_duplicate=True),
+    Output('label_finalscore', 'children'),
+    Output('input_ans', 'value', allow_duplicate=True),
+
+    Input('store_submission', 'data'),
+
+    State('navbar', 'brand'),
+
+    prevent_initial_call=True,
+)
+def submit_game(submission: dict, brand: dict) -> tuple[dict, dict, str, str]:
+    """
+    Ends a game played in client mode. The answer log submitted by the browser is replayed against
+    the deck of the game's session to re-verify the score, which is then recorded along with
+    timestamp, username, difficulty and operator. Each game can be submitted once.
+    """
+    game = verify_game_token(submission.get('token')) if isinstance(submission, dict) else None
+    # Only the request that removes the session records the game, however often it is submitted
+    session = pop_session(game['session_id']) if game is not None else None
+    if session is None:
+        raise PreventUpdate
+
+    # Reject malformed logs and games submitted long after their timer ran out
+    log = submission.get('log')
+    elapsed = time.time() - session['started_at']
+    if not isinstance(log, list) or elapsed > GAME_DURATION + SUBMIT_GRACE:
+        return {'display':' block'}, {'display':' none'}, 'Your game could not be verified', ''
+
+    # A game cannot have more answers than could be typed while it ran
+    max_answers = int(min(elapsed, GAME_DURATION) * MAX_ANSWER_RATE)
+    score = score_answer_log(
+        session['operator'], session['difficulty'], session['seed'], log, session.get('served', 0), max_answers,
+    )
+
+    # Records score
+    timestamp = datetime.date.today()
+    username = brand[0]['props']['children'].split(' ')[3][:-1]
+    record_score(
+        timestamp=timestamp,
+        username=username,
+        difficulty=session['difficulty'],
+        operator=session['operator'] if session['difficulty'] == 'Normal' else 'Invalid',
+        score=score,
+    )
+
+    return {'display':' block'}, {'display':' none'}, f'Your final score is {score}', ''
+
 @callback(
     Output('container_end', 'style', allow_duplicate=True),
     Output('container_start', 'style', allow_duplicate=True),
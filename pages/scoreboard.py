@@ -1,24 +1,34 @@
 # Import libraries
+import threading
 import pandas as pd
 
 import dash
-from dash import dcc, callback, Output, Input, State, dash_table
+from dash import dcc, html, callback, Output, Input, State, dash_table, no_update
+from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
 
-import plotly.express as px
+import plotly.graph_objects as go
 
-from scoreboard_db import get_scoreboard
+import scoreboard_db
+from metrics import log_event
+from scoreboard_db import CATEGORIES
+from leaderboard import get_leaderboard
+from score_stats import get_score_summary
+from scoreboard_events import get_category_version
 
 dash.register_page(__name__)
 
+# Components of each category shared by every client, rebuilt only when its scores change
+_components = {}
+_build_lock = threading.Lock()
+
 # Helper functions
 def create_scoreboard(difficulty: str, operator: str, empty: bool = False) -> dash_table.DataTable:
     """
     Generates a scoreboard in the form of a Dash DataTable depending on the selected
     difficulty and operator. Scoreboard is sorted by descending score and limited to 10 scores.
     """
-    # Retrieve scores
-    df_scoreboard = get_scoreboard()
+    # Retrieve top 10 scores sorted by descending score
     if empty:
         df_scoreboard = pd.DataFrame({
             'timestamp': [],
@@ -27,16 +37,11 @@ def create_scoreboard(difficulty: str, operator: str, empty: bool = False) -> da
             'operator': [],
             'score': [],
         })
-
-    # Filter df
-    df_scoreboard = df_scoreboard[df_scoreboard['difficulty'] == difficulty]
-    df_scoreboard = df_scoreboard[df_scoreboard['operator'] == operator]
-
-    # Sort df
-    df_scoreboard = df_scoreboard.sort_values(by=['score'], ascending=False)
-
-    # Limit df
-    df_scoreboard = df_scoreboard.head(10)
+    else:
+        df_scoreboard = pd.DataFrame(
+            get_leaderboard(difficulty, operator),
+            columns=['timestamp', 'username', 'difficulty', 'operator', 'score'],
+        )
 
     # Add rank
     df_scoreboard['rank'] = [i for i in range(1, len(df_scoreboard)+1)]
@@ -90,43 +95,77 @@ def create_scoreboard(difficulty: str, operator: str, empty: bool = False) -> da
 def create_statistic(difficulty: str, operator: str, empty: bool = False) -> dcc.Graph:
     """
     Generates a histogram of scores of all users using plotly based on the selected
-    difficulty and operator.
+    difficulty and operator. The histogram is drawn from per-score counts maintained as
+    scores are recorded, so its size does not grow with the number of games.
     """
-    # Retrieve scores
-    df_scoreboard = get_scoreboard()
+    # Retrieve score summary of category
     if empty:
-        df_scoreboard = pd.DataFrame({
-            'timestamp': [],
-            'username': [],
-            'difficulty': [],
-            'operator': [],
-            'score': [],
-        })
-
-    # Filter df
-    df_scoreboard = df_scoreboard[df_scoreboard['difficulty'] == difficulty]
-    df_scoreboard = df_scoreboard[df_scoreboard['operator'] == operator]
+        summary = {'buckets': [], 'counts': [], 'count': 0}
+    else:
+        summary = get_score_summary(difficulty, operator)
 
     # Create figure
-    fig = px.histogram(df_scoreboard, 'score', nbins=len(df_scoreboard))
-
-    return dcc.Graph(figure=fig)
+    fig = go.Figure(go.Bar(x=summary['buckets'], y=summary['counts']))
+    fig.update_layout(bargap=0, xaxis_title='score', yaxis_title='count')
+    if summary['count']:
+        lower_quartile, median, upper_quartile = summary['quartiles']
+        fig.update_layout(
+            title=(
+                f'{summary["count"]} games, mean {summary["mean"]:.1f}, std {summary["std"]:.1f}, '
+                f'quartiles {lower_quartile:g} / {median:g} / {upper_quartile:g}'
+            ),
+        )
+
+    return dcc.Graph(figure=fig.to_dict())
+
+def get_category_components(difficulty: str, operator: str) -> tuple[list, list]:
+    """
+    Returns the data version and the scoreboard and statistic of a category. They are built at most
+    once per change of the category's scores and shared by every client, so concurrent callbacks
+    wait for a single rebuild instead of each reading the scores. The data version is the
+    scoreboard generation and the number of games of the category, so it is the same in every
+    process serving the same scores and never repeats for different ones.
+    """
+    category = (difficulty, operator)
+    cached = _components.get(category)
+    if cached is not None and cached[0] == get_category_version(difficulty, operator):
+        return cached[1], cached[2]
+
+    with _build_lock:
+        version = get_category_version(difficulty, operator)
+        cached = _components.get(category)
+        if cached is None or cached[0] != version:
+            # Read before the components, so a rewrite meanwhile cannot pair a new generation with old data
+            generation = scoreboard_db.get_generation()
+            cached = (
+                version,
+                [generation, get_score_summary(difficulty, operator)['count']],
+                [create_scoreboard(difficulty, operator), create_statistic(difficulty, operator)],
+            )
+            _components[category] = cached
+    return cached[1], cached[2]
 
 # Page layout
 layout = dbc.Container(fluid=True, children=[
 
-    # Interval to update data every second
-    dcc.Interval(
-        id='interval_scoreboard_statistic',
-        interval=1000,
-        n_intervals=0,
+    # Data version of each category last sent to this client
+    dcc.Store(
+        id='store_scoreboard_versions',
+        data={},
+    ),
+
+    # Clicked by assets/scoreboard_events.js whenever the server pushes a scoreboard change
+    html.Button(
+        id='btn_scoreboard_refresh',
+        n_clicks=0,
+        style={'display': 'none'},
     ),
 
     # Global scoreboard and statistics
     dbc.Col(
         dbc.Container(fluid=True, class_name='scoreboardcard', children=[
 
-            dbc.Label('Updated every second', style={'color': '#bfbfbf'}),
+            dbc.Label('Updated live', style={'color': '#bfbfbf'}),
 
             # Select difficulty
             dbc.Tabs([
@@ -185,18 +224,32 @@ layout = dbc.Container(fluid=True, children=[
     Output('score_stats_multiplication', 'children'),
     Output('score_stats_division', 'children'),
     Output('score_stats_hard', 'children'),
+    Output('store_scoreboard_versions', 'data'),
 
-    Input('interval_scoreboard_statistic', 'n_intervals'),
+    Input('btn_scoreboard_refresh', 'n_clicks'),
+    State('store_scoreboard_versions', 'data'),
 )
-def handle_update_data(n_interval: int) -> list[dash_table.DataTable]:
+def handle_update_data(n_refresh: int, seen_versions: dict) -> list:
     """
-    Updates scoreboard and statistics every second.
+    Updates scoreboard and statistics when the page loads and whenever the server pushes a change.
+    Only categories whose data version differs from the one last sent to this client are sent.
+    A pushed change may have been recorded by another worker just before, so scores recorded
+    elsewhere are always read first rather than at most once a second.
     """
-    print('Updating scoreboard and statistics', n_interval)
-    return [
-        [create_scoreboard('Normal', 'Addition'), create_statistic('Normal', 'Addition')],
-        [create_scoreboard('Normal', 'Subtraction'), create_statistic('Normal', 'Subtraction')],
-        [create_scoreboard('Normal', 'Multiplication'), create_statistic('Normal', 'Multiplication')],
-        [create_scoreboard('Normal', 'Division'), create_statistic('Normal', 'Division')],
-        [create_scoreboard('Hard', 'Invalid'), create_statistic('Hard', 'Invalid'),],
-    ]
+    scoreboard_db.refresh()
+
+    seen_versions = seen_versions or {}
+    versions = {}
+    children = []
+    for difficulty, operator in CATEGORIES:
+        key = f'{difficulty}/{operator}'
+        versions[key], components = get_category_components(difficulty, operator)
+        children.append(no_update if seen_versions.get(key) == versions[key] else components)
+
+    if versions == seen_versions:
+        raise PreventUpdate
+    log_event(
+        'scoreboard_update', refresh=n_refresh,
+        changed=[key for key, version in versions.items() if seen_versions.get(key) != version],
+    )
+    return children + [versions]
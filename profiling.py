@@ -0,0 +1,136 @@
+# Import libraries
+import os
+import sys
+import json
+import time
+import random
+import threading
+from collections import Counter
+
+from flask import Response, request
+from dash import Dash
+
+from metrics import UPDATE_PATH, get_callback_name, logger
+
+# Profiling config. Callbacks are profiled only when named in MATHSPRINT_PROFILE, e.g.
+# 'handle_end_game,handle_update_data', or when it is 'all'.
+PROFILE_CALLBACKS = {name.strip() for name in os.environ.get('MATHSPRINT_PROFILE', '').split(',') if name.strip()}
+PROFILE_DIR = os.environ.get('MATHSPRINT_PROFILE_DIR', 'profiles')
+PROFILE_RATE = float(os.environ.get('MATHSPRINT_PROFILE_RATE', 0.01))
+PROFILE_MAX_PER_MINUTE = int(os.environ.get('MATHSPRINT_PROFILE_MAX_PER_MINUTE', 6))
+PROFILE_INTERVAL = float(os.environ.get('MATHSPRINT_PROFILE_INTERVAL', 0.001))
+
+# Requests carrying this header are always profiled, within PROFILE_MAX_PER_MINUTE
+PROFILE_HEADER = 'X-MathSprint-Profile'
+
+class StackSampler:
+    """
+    Samples the stack of one thread every interval seconds from a background thread and counts
+    each stack in the collapsed format of flamegraph.pl and speedscope.
+    """
+    def __init__(self, thread_id: int, interval: float = PROFILE_INTERVAL) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(names))] += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+class RateLimiter:
+    """
+    Allows at most limit events per minute of this process.
+    """
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self._window = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        window = int(time.monotonic() // 60)
+        with self._lock:
+            if window != self._window:
+                self._window = window
+                self._count = 0
+            if self._count >= self.limit:
+                return False
+            self._count += 1
+            return True
+
+# Callback request profiled by the current thread
+_request_state = threading.local()
+
+# Helper functions
+def write_collapsed(name: str, stacks: Counter) -> str:
+    """
+    Writes sampled stacks of a callback to PROFILE_DIR as one 'frame;frame;frame count' line per
+    stack and returns the path of the file.
+    """
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    filename = f'{name}-{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}-{time.monotonic_ns()}.folded'
+    path = os.path.join(PROFILE_DIR, filename)
+    with open(path, 'w') as file:
+        for stack, count in stacks.most_common():
+            file.write(f'{stack} {count}\n')
+    return path
+
+def init_app(app: Dash) -> None:
+    """
+    Profiles callbacks selected by MATHSPRINT_PROFILE on a PROFILE_RATE fraction of their requests,
+    and any callback request with the PROFILE_HEADER header, capped at PROFILE_MAX_PER_MINUTE
+    profiles per process. Does nothing unless MATHSPRINT_PROFILE is set.
+    """
+    if not PROFILE_CALLBACKS:
+        return
+
+    server = app.server
+    limiter = RateLimiter(PROFILE_MAX_PER_MINUTE)
+    profile_all = 'all' in PROFILE_CALLBACKS
+
+    @server.before_request
+    def start_profile() -> None:
+        _request_state.sampler = None
+        if request.path != UPDATE_PATH:
+            return
+        body = request.get_json(silent=True) or {}
+        name = get_callback_name(app, body.get('output', ''))
+        if request.headers.get(PROFILE_HEADER):
+            selected = True
+        else:
+            selected = (profile_all or name in PROFILE_CALLBACKS) and random.random() < PROFILE_RATE
+        if selected and limiter.allow():
+            _request_state.name = name
+            _request_state.sampler = StackSampler(threading.get_ident())
+            _request_state.sampler.start()
+
+    @server.after_request
+    def stop_profile(response: Response) -> Response:
+        sampler = getattr(_request_state, 'sampler', None)
+        if sampler is not None:
+            _request_state.sampler = None
+            stacks = sampler.stop()
+            if stacks:
+                path = write_collapsed(_request_state.name, stacks)
+                logger.info(json.dumps({
+                    'event': 'profile', 'callback': _request_state.name, 'samples': sum(stacks.values()), 'path': path,
+                }))
+        return response
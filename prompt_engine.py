@@ -0,0 +1,271 @@
+# Import libraries
+import re
+import secrets
+import numpy as np
+
+# Operand grids of normal prompts, as (first operand range, second operand range)
+NORMAL_GRIDS = {
+    'Addition': (range(1, 101), range(1, 101)),
+    'Subtraction': (range(1, 101), range(1, 101)),
+    'Multiplication': (range(0, 13), range(0, 13)),
+    'Division': (range(0, 13), range(1, 13)),
+}
+HARD_DECK_SIZE = 1000
+
+# Operator codes of prompt arrays
+ADD, SUB, MUL, DIV = range(4)
+OPERATOR_SYMBOLS = ('+', '-', 'x', '/')
+
+# Random 64-bit words drawn per hard prompt, i.e. one Philox counter block
+HARD_WORDS = 4
+
+# Fewer prompts than this are permuted one by one, as the vectorised permutation has a fixed cost
+# of a few hundred microseconds
+VECTORISE_MIN = 128
+
+FEISTEL_ROUNDS = 4
+MASK_64 = (1 << 64) - 1
+
+class Prompt:
+    """
+    Math prompt made of operands and the operators between them. Its short string form, e.g.
+    '12x7' or '45+5/1', is how prompts are sent to and drawn by the browser. Operands are never
+    negative, so every '-' in the string form is an operator.
+    """
+    __slots__ = ('operands', 'operators')
+
+    def __init__(self, operands: tuple[int, ...], operators: str) -> None:
+        if len(operators) != len(operands) - 1:
+            raise ValueError('A prompt needs exactly one operator between each pair of operands')
+        self.operands = operands
+        self.operators = operators
+
+    @classmethod
+    def parse(cls, text: str) -> 'Prompt':
+        """
+        Reads a prompt back from its string form.
+        """
+        tokens = re.findall(r'\d+|[^\d]', text)
+        return cls(tuple(int(token) for token in tokens[::2]), ''.join(tokens[1::2]))
+
+    def __str__(self) -> str:
+        text = str(self.operands[0])
+        for symbol, operand in zip(self.operators, self.operands[1:]):
+            text += f'{symbol}{operand}'
+        return text
+
+    def __repr__(self) -> str:
+        return f'Prompt({str(self)!r})'
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Prompt):
+            return NotImplemented
+        return self.operands == other.operands and self.operators == other.operators
+
+    def __hash__(self) -> int:
+        return hash((self.operands, self.operators))
+
+# Helper functions
+def new_seed() -> int:
+    """
+    Returns a random seed identifying the shuffled deck of a new game.
+    """
+    return secrets.randbits(63)
+
+def _mix(value: int, key: int) -> int:
+    """
+    Round function of the Feistel network (splitmix64 finaliser over value and key).
+    """
+    x = (value * 0x9E3779B97F4A7C15 + key) & MASK_64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK_64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK_64
+    return x ^ (x >> 31)
+
+def permute(index: int, size: int, seed: int) -> int:
+    """
+    Maps index to its position in a seeded pseudo-random permutation of range(size) without
+    materialising the permutation. A balanced Feistel network is a bijection over the smallest
+    even number of bits covering size, and cycle walking keeps the result within range(size).
+    """
+    if not 0 <= index < size:
+        raise IndexError(f'Index {index} out of range for deck of size {size}')
+
+    half_bits = max(1, ((size - 1).bit_length() + 1) // 2)
+    half_mask = (1 << half_bits) - 1
+    while True:
+        left, right = index >> half_bits, index & half_mask
+        for r in range(FEISTEL_ROUNDS):
+            left, right = right, left ^ (_mix(right, seed * FEISTEL_ROUNDS + r) & half_mask)
+        index = (left << half_bits) | right
+        if index < size:
+            return index
+
+def deck_size(operator: str, difficulty: str) -> int:
+    """
+    Returns the number of prompts in a deck of the given difficulty and operator.
+    """
+    if difficulty == 'Hard':
+        return HARD_DECK_SIZE
+    first, second = NORMAL_GRIDS[operator]
+    return len(first) * len(second)
+
+def _mix_array(values: np.ndarray, key: int) -> np.ndarray:
+    """
+    Vectorised _mix over an array of uint64 values. uint64 arithmetic wraps like the masks of _mix.
+    """
+    x = values * np.uint64(0x9E3779B97F4A7C15) + np.uint64(key & MASK_64)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+def permute_array(indices: np.ndarray, size: int, seed: int) -> np.ndarray:
+    """
+    Vectorised permute: maps every index to the same position as permute does.
+    """
+    half_bits = np.uint64(max(1, ((size - 1).bit_length() + 1) // 2))
+    half_mask = (np.uint64(1) << half_bits) - np.uint64(1)
+    result = np.asarray(indices, dtype=np.uint64).copy()
+    pending = np.arange(len(result))
+    while len(pending):
+        index = result[pending]
+        left, right = index >> half_bits, index & half_mask
+        for r in range(FEISTEL_ROUNDS):
+            left, right = right, left ^ (_mix_array(right, seed * FEISTEL_ROUNDS + r) & half_mask)
+        result[pending] = (left << half_bits) | right
+        pending = pending[result[pending] >= size]
+    return result.astype(np.int64)
+
+def _normal_arrays(operator: str, positions: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Decodes positions of the operand grid into operand, operator code and answer arrays.
+    """
+    first, second = NORMAL_GRIDS[operator]
+    i = first.start + positions // len(second)
+    j = second.start + positions % len(second)
+
+    if operator == 'Multiplication':
+        operands, code, answers = (i, j), MUL, i * j
+    elif operator == 'Addition':
+        operands, code, answers = (i, j), ADD, i + j
+    elif operator == 'Subtraction':
+        operands, code, answers = (i, j), SUB, i - j
+    else:
+        operands, code, answers = (i * j, j), DIV, i
+    operators = np.full((len(positions), 1), code, dtype=np.int8)
+    return np.stack(operands, axis=1).astype(np.int16), operators, answers.astype(np.int16)
+
+def _build_canonical_deck(operator: str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Builds the unshuffled deck of a normal operator as read-only arrays.
+    """
+    first, second = NORMAL_GRIDS[operator]
+    deck = _normal_arrays(operator, np.arange(len(first) * len(second)))
+    for array in deck:
+        array.flags.writeable = False
+    return deck
+
+# Unshuffled normal decks, built once at import and shared by every game. A game only draws a seed
+# and reads its prompts through the permutation of that seed.
+CANONICAL_DECKS = {operator: _build_canonical_deck(operator) for operator in NORMAL_GRIDS}
+
+def _hard_arrays(seed: int, start: int, count: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Draws hard prompts start to start + count of the deck of seed, each consisting of 3 operands
+    and 2 operators (+ or - and * or /). Every prompt is decoded from its own block of a Philox
+    stream keyed by seed, so any slice of a deck can be drawn without drawing the prompts before
+    it, and divisions never have a zero divisor, so no prompt is ever dropped.
+    """
+    bit_generator = np.random.Philox(key=seed)
+    bit_generator.advance(start)
+    words = bit_generator.random_raw(HARD_WORDS * count).reshape(count, HARD_WORDS)
+    bits = words[:, 3]
+
+    # Inner term i * j or (i * j) / j
+    multiply = (bits & np.uint64(1)).astype(bool)
+    i = (words[:, 0] % np.uint64(13)).astype(np.int64)
+    j = np.where(multiply, words[:, 1] % np.uint64(13), words[:, 1] % np.uint64(12) + np.uint64(1))
+    j = j.astype(np.int64)
+    inner_first = np.where(multiply, i, i * j)
+    inner_answer = np.where(multiply, i * j, i)
+    inner_operator = np.where(multiply, MUL, DIV)
+
+    # Outer term + k or - k, placed before or after the inner term
+    k = (words[:, 2] % np.uint64(100)).astype(np.int64) + 1
+    add = ((bits >> np.uint64(1)) & np.uint64(1)).astype(bool)
+    k_first = ((bits >> np.uint64(2)) & np.uint64(1)).astype(bool)
+    outer_operator = np.where(add, ADD, SUB)
+    answers = np.where(add, inner_answer + k, np.where(k_first, k - inner_answer, inner_answer - k))
+
+    operands = np.empty((count, 3), dtype=np.int16)
+    operands[:, 0] = np.where(k_first, k, inner_first)
+    operands[:, 1] = np.where(k_first, inner_first, j)
+    operands[:, 2] = np.where(k_first, j, k)
+    operators = np.empty((count, 2), dtype=np.int8)
+    operators[:, 0] = np.where(k_first, outer_operator, inner_operator)
+    operators[:, 1] = np.where(k_first, inner_operator, outer_operator)
+    return operands, operators, answers.astype(np.int16)
+
+def generate_deck(
+    operator: str, difficulty: str, seed: int, size: int | None = None
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Generates a whole shuffled deck in one vectorised pass, as an operand array of shape
+    (size, operand count), an operator code array of shape (size, operand count - 1) and an answer
+    array. Prompt i of the deck is the same as get_prompt(operator, difficulty, seed, i).
+    Hard decks can be of any size, e.g. for exports; normal decks are always their whole grid.
+    """
+    if difficulty == 'Hard':
+        return _hard_arrays(seed, 0, HARD_DECK_SIZE if size is None else size)
+
+    full_size = deck_size(operator, difficulty)
+    if size is not None and size != full_size:
+        raise ValueError(f'Normal {operator} decks have exactly {full_size} prompts')
+    return get_prompts(operator, difficulty, seed, 0, full_size)
+
+def get_prompts(
+    operator: str, difficulty: str, seed: int, start: int, stop: int
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Returns the operand, operator code and answer arrays of prompts start to stop of the deck
+    shuffled by seed, clipped to the size of the deck. Normal prompts are gathered from the
+    canonical deck of their operator.
+    """
+    size = deck_size(operator, difficulty)
+    start, stop = max(0, start), min(stop, size)
+    if difficulty == 'Hard':
+        return _hard_arrays(seed, start, max(0, stop - start))
+
+    operands, operators, answers = CANONICAL_DECKS[operator]
+    indices = range(start, max(start, stop))
+    if len(indices) < VECTORISE_MIN:
+        positions = np.fromiter(
+            (permute(index, size, seed) for index in indices), dtype=np.int64, count=len(indices)
+        )
+    else:
+        positions = permute_array(np.arange(start, stop), size, seed)
+    return operands[positions], operators[positions], answers[positions]
+
+def to_prompt(operands: np.ndarray, operators: np.ndarray) -> Prompt:
+    """
+    Builds the prompt of a row of operands and operator codes of a deck.
+    """
+    return Prompt(
+        tuple(operands.tolist()), ''.join(OPERATOR_SYMBOLS[code] for code in operators.tolist())
+    )
+
+def get_prompt(operator: str, difficulty: str, seed: int, index: int) -> tuple[Prompt, int]:
+    """
+    Returns the prompt and answer at index of the deck shuffled by seed. The same
+    (operator, difficulty, seed, index) always yields the same prompt, so a game only needs to
+    remember its seed and cursor.
+    """
+    size = deck_size(operator, difficulty)
+    if difficulty == 'Hard':
+        if not 0 <= index < size:
+            raise IndexError(f'Index {index} out of range for deck of size {size}')
+        operands, operators, answers = _hard_arrays(seed, index, 1)
+        return to_prompt(operands[0], operators[0]), int(answers[0])
+
+    operands, operators, answers = CANONICAL_DECKS[operator]
+    position = permute(index, size, seed)
+    return to_prompt(operands[position], operators[position]), int(answers[position])
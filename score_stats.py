@@ -0,0 +1,115 @@
+# Import libraries
+import scoreboard_db
+from scoreboard_db import CATEGORIES
+
+# Scores are integers, so buckets of width 1 keep the histogram and its quantiles exact
+BUCKET_WIDTH = 1
+
+class ScoreSketch:
+    """
+    Streaming summary of the scores of a category: a count per score bucket plus a running mean
+    and variance (Welford). Its size depends on the range of scores, not on the number of games,
+    and sketches are mergeable, so summaries of separate partitions or processes can be combined.
+    Quantiles are read off the bucket counts and are accurate to within the bucket width.
+    """
+    def __init__(self, bucket_width: int = BUCKET_WIDTH) -> None:
+        self.bucket_width = bucket_width
+        self.buckets = {}
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def _merge_moments(self, count: int, mean: float, m2: float) -> None:
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self._m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+
+    def add(self, score: int, count: int = 1) -> None:
+        """
+        Adds count games with the given score.
+        """
+        if count <= 0:
+            return
+        bucket = score // self.bucket_width * self.bucket_width
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+        self._merge_moments(count, float(score), 0.0)
+
+    def merge(self, other: 'ScoreSketch') -> None:
+        """
+        Adds every game summarised by another sketch of the same bucket width.
+        """
+        if other.bucket_width != self.bucket_width:
+            raise ValueError('Cannot merge sketches with different bucket widths')
+        if other.count == 0:
+            return
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+        self._merge_moments(other.count, other.mean, other._m2)
+
+    @property
+    def variance(self) -> float:
+        return self._m2 / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float | None:
+        """
+        Returns the approximate q-quantile of the scores, or None if there are no scores.
+        """
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        cumulative = 0
+        for bucket in sorted(self.buckets):
+            cumulative += self.buckets[bucket]
+            if cumulative > rank:
+                return bucket + (self.bucket_width - 1) / 2
+        return bucket + (self.bucket_width - 1) / 2
+
+    def histogram(self) -> tuple[list, list]:
+        """
+        Returns the score buckets in ascending order and the number of games in each.
+        """
+        buckets = sorted(self.buckets)
+        return buckets, [self.buckets[bucket] for bucket in buckets]
+
+def _seed() -> dict:
+    """
+    Seeds the sketch of every category from the score counts of scoreboard_db.
+    """
+    sketches = {category: ScoreSketch() for category in CATEGORIES}
+    df_counts = scoreboard_db.get_score_counts()
+    for difficulty, operator, score, count in df_counts.itertuples(index=False):
+        sketch = sketches.get((difficulty, operator))
+        if sketch is not None:
+            sketch.add(int(score), int(count))
+    return sketches
+
+def _update(sketches: dict, records: list[dict]) -> None:
+    """
+    Adds newly recorded scores.
+    """
+    for record in records:
+        sketch = sketches.get((record['difficulty'], record['operator']))
+        if sketch is not None:
+            sketch.add(record['score'])
+
+_sketches = scoreboard_db.ScoreAggregate(_seed, _update)
+
+def get_score_summary(difficulty: str, operator: str) -> dict:
+    """
+    Returns the histogram, mean, standard deviation and quartiles of the scores of a category.
+    Sketches are seeded from scoreboard_db on first use and kept up to date as scores are recorded.
+    """
+    sketches = _sketches.get()
+    with _sketches.lock:
+        sketch = sketches[(difficulty, operator)]
+        buckets, counts = sketch.histogram()
+        return {
+            'buckets': buckets,
+            'counts': counts,
+            'count': sketch.count,
+            'mean': sketch.mean,
+            'std': sketch.variance ** 0.5,
+            'quartiles': [sketch.quantile(q) for q in (0.25, 0.5, 0.75)],
+        }
@@ -0,0 +1,421 @@
+# Import libraries
+import os
+import time
+import queue
+import datetime
+import atexit
+import threading
+from concurrent.futures import Future
+from typing import Callable
+import pandas as pd
+
+from metrics import db_timer, logger
+from scoreboard_db.csv_engine import CSVEngine, SCOREBOARD_COLUMNS
+from scoreboard_db.sqlite_engine import SQLiteEngine
+from scoreboard_db.parquet_engine import ParquetEngine
+from scoreboard_db.log_engine import LogEngine
+from scoreboard_db.partitioned_engine import PartitionedEngine
+from scoreboard_db.history import ScoreHistory
+
+# Storage config
+SCOREBOARD_ENGINE = os.environ.get('MATHSPRINT_SCOREBOARD_ENGINE', 'sqlite')
+SCOREBOARD_CSV = os.environ.get('MATHSPRINT_SCOREBOARD_CSV', 'mathsprint_scoreboard.csv')
+SCOREBOARD_DB = os.environ.get('MATHSPRINT_SCOREBOARD_DB', 'mathsprint_scoreboard.db')
+SCOREBOARD_PARQUET = os.environ.get('MATHSPRINT_SCOREBOARD_PARQUET', 'mathsprint_scoreboard.parquet')
+SCOREBOARD_LOG = os.environ.get('MATHSPRINT_SCOREBOARD_LOG', 'mathsprint_scoreboard.log')
+SCOREBOARD_PARTITIONS = os.environ.get('MATHSPRINT_SCOREBOARD_PARTITIONS', 'mathsprint_scoreboard_partitions')
+SCOREBOARD_SEGMENT_ENGINE = os.environ.get('MATHSPRINT_SCOREBOARD_SEGMENT_ENGINE', 'log')
+
+# Recorded scores are acknowledged once queued ('enqueue') or once written and synced to disk ('fsync')
+SCOREBOARD_DURABILITY = os.environ.get('MATHSPRINT_SCOREBOARD_DURABILITY', 'enqueue')
+SCOREBOARD_QUEUE_SIZE = int(os.environ.get('MATHSPRINT_SCOREBOARD_QUEUE_SIZE', 1024))
+DURABILITY_LEVELS = ['enqueue', 'fsync']
+
+# Records appended by the background writer in one write at most
+MAX_BATCH = 256
+
+# Reads of an in-memory aggregate's seed before it is used without being kept
+SEED_ATTEMPTS = 3
+
+# Games older than SCOREBOARD_RAW_DAYS are compacted into daily aggregates every
+# SCOREBOARD_COMPACT_INTERVAL seconds, if set, and aggregates are kept SCOREBOARD_HISTORY_DAYS, or forever if 0
+SCOREBOARD_HISTORY = os.environ.get('MATHSPRINT_SCOREBOARD_HISTORY', 'mathsprint_scoreboard_history.db')
+SCOREBOARD_RAW_DAYS = int(os.environ.get('MATHSPRINT_SCOREBOARD_RAW_DAYS', 30))
+SCOREBOARD_HISTORY_DAYS = int(os.environ.get('MATHSPRINT_SCOREBOARD_HISTORY_DAYS', 0))
+SCOREBOARD_COMPACT_INTERVAL = float(os.environ.get('MATHSPRINT_SCOREBOARD_COMPACT_INTERVAL', 0))
+
+# Highest games kept per day and category, at least the size of the leaderboard
+SCOREBOARD_TOP_K = int(os.environ.get('MATHSPRINT_SCOREBOARD_TOP_K', 10))
+
+# Categories shown on the scoreboard as (difficulty, operator)
+CATEGORIES = [
+    ('Normal', 'Addition'),
+    ('Normal', 'Subtraction'),
+    ('Normal', 'Multiplication'),
+    ('Normal', 'Division'),
+    ('Hard', 'Invalid'),
+]
+
+_engine = None
+_engine_lock = threading.Lock()
+_history = ScoreHistory(SCOREBOARD_HISTORY)
+
+# Functions notified of every record appended by this process, and of writes made elsewhere
+_listeners = []
+_reset_listeners = []
+
+# Version of the scoreboard that this process's listeners have seen every write up to, as
+# (engine version, history version)
+_observed_version = None
+_last_refresh = 0.0
+_flush_lock = threading.RLock()
+
+def get_engine() -> CSVEngine | SQLiteEngine | ParquetEngine | LogEngine | PartitionedEngine:
+    """
+    Returns the storage engine selected by MATHSPRINT_SCOREBOARD_ENGINE, created on first use.
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            if SCOREBOARD_ENGINE == 'csv':
+                _engine = CSVEngine(SCOREBOARD_CSV)
+            elif SCOREBOARD_ENGINE == 'sqlite':
+                # Commits are synced one by one when every recorded score must be durable
+                synchronous = 'FULL' if SCOREBOARD_DURABILITY == 'fsync' else 'NORMAL'
+                _engine = SQLiteEngine(SCOREBOARD_DB, csv_path=SCOREBOARD_CSV, synchronous=synchronous)
+            elif SCOREBOARD_ENGINE == 'parquet':
+                _engine = ParquetEngine(SCOREBOARD_PARQUET, csv_path=SCOREBOARD_CSV)
+            elif SCOREBOARD_ENGINE == 'log':
+                _engine = LogEngine(SCOREBOARD_LOG, csv_path=SCOREBOARD_CSV)
+            elif SCOREBOARD_ENGINE == 'partitioned':
+                _engine = PartitionedEngine(
+                    SCOREBOARD_PARTITIONS, SCOREBOARD_SEGMENT_ENGINE, csv_path=SCOREBOARD_CSV
+                )
+            else:
+                raise ValueError(f'Unknown scoreboard engine: {SCOREBOARD_ENGINE}')
+    return _engine
+
+def set_engine(engine: CSVEngine | SQLiteEngine | ParquetEngine | LogEngine | PartitionedEngine) -> None:
+    """
+    Replaces the storage engine, e.g. with an engine over another file, and resets listeners so
+    that in-memory aggregates are seeded again from the new engine.
+    """
+    global _engine, _observed_version
+    with _flush_lock:
+        with _engine_lock:
+            _engine = engine
+        _observed_version = get_version()
+        for on_reset in _reset_listeners:
+            on_reset()
+
+def get_scoreboard() -> pd.DataFrame:
+    """
+    Reads every score not yet compacted and returns pandas dataframe.
+    """
+    with db_timer('read'):
+        return get_engine().read()
+
+def write_scoreboard(df_scoreboard: pd.DataFrame) -> None:
+    """
+    Replaces every score with the rows of a Pandas DataFrame.
+    """
+    with db_timer('write'):
+        get_engine().write(df_scoreboard)
+        _history.bump_version()
+
+def get_top_scores(difficulty: str, operator: str, limit: int = 10) -> pd.DataFrame:
+    """
+    Returns the highest scores of a category in descending order, including compacted games.
+    """
+    with db_timer('top_scores'):
+        df_top = get_engine().top_scores(difficulty, operator, limit)
+        if not _history.exists():
+            return df_top
+        df_compacted = _history.top_scores(difficulty, operator, limit)
+    if len(df_compacted) == 0:
+        return df_top
+    df_top = pd.concat([df_top, df_compacted], ignore_index=True) if len(df_top) else df_compacted
+    return df_top.sort_values(by=['score'], ascending=False, kind='stable').head(limit).reset_index(drop=True)
+
+def get_score_counts() -> pd.DataFrame:
+    """
+    Returns the number of games per (difficulty, operator, score), including compacted games.
+    """
+    with db_timer('score_counts'):
+        df_counts = get_engine().score_counts()
+        if not _history.exists():
+            return df_counts
+        df_compacted = _history.score_counts()
+    if len(df_compacted) == 0:
+        return df_counts
+    df_counts = pd.concat([df_counts, df_compacted], ignore_index=True) if len(df_counts) else df_compacted
+    return df_counts.groupby(['difficulty', 'operator', 'score'], as_index=False)['count'].sum()
+
+def get_generation() -> int:
+    """
+    Returns the generation of the scoreboard as listeners have seen it, a counter increased by
+    every rewrite, compaction and expiry. Within a generation games are only ever added, so the
+    generation and a number of games together identify the games of a category in every process.
+    """
+    with _flush_lock:
+        if _observed_version is not None:
+            return _observed_version[1]
+    return _history.version()
+
+def get_version() -> object:
+    """
+    Returns a token of the current scoreboard content that changes with every write or compaction.
+    """
+    with db_timer('version'):
+        return (get_engine().version(), _history.version())
+
+def subscribe(
+    listener: Callable[[list[dict]], None], on_reset: Callable[[], None] | None = None
+) -> None:
+    """
+    Registers a function called with the records of every append to the scoreboard, made by this
+    process or read back from the engine once another process made it, e.g. to maintain in-memory
+    aggregates incrementally instead of re-reading the scoreboard. on_reset is called when the
+    scoreboard was rewritten or compacted, so that the aggregates are seeded again.
+    """
+    _listeners.append(listener)
+    if on_reset is not None:
+        _reset_listeners.append(on_reset)
+
+def _advance() -> bool:
+    """
+    Brings listeners up to date with the scoreboard: records appended since they last saw it are
+    read back from the engine and passed on, and listeners are reset if it was rewritten or
+    compacted instead. Must hold the flush lock. Returns True if listeners were notified.
+    """
+    global _observed_version
+    history_version = _history.version()
+    engine = get_engine()
+    if _observed_version is None or history_version != _observed_version[1]:
+        records, engine_version = None, engine.version()
+    else:
+        records, engine_version = engine.changes_since(_observed_version[0])
+
+    changed = (engine_version, history_version) != _observed_version
+    _observed_version = (engine_version, history_version)
+    if records is None:
+        for on_reset in _reset_listeners:
+            on_reset()
+    elif records:
+        for listener in _listeners:
+            listener(records)
+    return changed
+
+class ScoreAggregate:
+    """
+    In-memory aggregate of the scoreboard, such as leaderboards or score histograms. It is seeded
+    by seed() on first use, kept up to date by update(state, records) with the records of every
+    append, and seeded again after the scoreboard was rewritten or compacted. Readers of a state
+    that update() mutates in place hold lock while reading it.
+    """
+    def __init__(self, seed: Callable[[], object], update: Callable[[object, list[dict]], None]) -> None:
+        self._seed = seed
+        self._update = update
+        self._state = None
+        self.lock = threading.Lock()
+        subscribe(self._on_scores_recorded, on_reset=self._on_reset)
+
+    def _on_scores_recorded(self, records: list[dict]) -> None:
+        # An aggregate that is not seeded yet will read these records from the scoreboard when it is
+        with self.lock:
+            if self._state is not None:
+                self._update(self._state, records)
+
+    def _on_reset(self) -> None:
+        with self.lock:
+            self._state = None
+
+    def get(self) -> object:
+        """
+        Returns the state of the aggregate, seeding it first if needed. The seed must match the
+        version listeners have seen, so it is read again if another process wrote meanwhile, and
+        used once without being kept if that happens every time.
+        """
+        state = self._state
+        if state is not None:
+            return state
+
+        with _flush_lock:
+            for _ in range(SEED_ATTEMPTS):
+                if self._state is not None:
+                    return self._state
+                _advance()
+                state = self._seed()
+                if get_version() == _observed_version:
+                    with self.lock:
+                        self._state = state
+                    break
+        return state
+
+def refresh(min_interval: float = 0.0) -> bool:
+    """
+    Brings listeners up to date with writes made by other processes since they last saw the
+    scoreboard. Costs a single version read when nothing changed, and runs at most once per
+    min_interval seconds. Returns True if listeners were notified.
+    """
+    global _last_refresh
+    now = time.monotonic()
+    if now - _last_refresh < min_interval:
+        return False
+
+    with _flush_lock:
+        _last_refresh = now
+        return _advance()
+
+def append_scores(records: list[dict]) -> None:
+    """
+    Appends records to the scoreboard without rewriting existing scores and notifies listeners.
+    """
+    global _observed_version
+    with _flush_lock:
+        with db_timer('append'):
+            before, after = get_engine().append(records)
+        if _observed_version is not None and before == _observed_version[0]:
+            _observed_version = (after, _observed_version[1])
+            for listener in _listeners:
+                listener(records)
+        else:
+            # Another process wrote first, so these records are read back along with its own
+            _advance()
+
+class ScoreWriter:
+    """
+    Appends recorded scores from a background thread. Callers put records on a bounded queue and
+    block only while it is full, and the thread appends every record waiting when it wakes up in
+    one write (group commit). With 'fsync' durability, callers wait until their record is written
+    and the engine synced, which a batch also shares.
+    """
+    def __init__(self, maxsize: int = SCOREBOARD_QUEUE_SIZE, durability: str = SCOREBOARD_DURABILITY) -> None:
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError(f'Unknown scoreboard durability: {durability}')
+        self.maxsize = maxsize
+        self.durability = durability
+        self._queue = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_queue(self) -> queue.Queue:
+        # A forked worker process inherits the queue but not the thread draining it
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(self.maxsize)
+                self._pid = os.getpid()
+                thread = threading.Thread(target=self._run, args=(self._queue,), name='scoreboard-writer', daemon=True)
+                thread.start()
+            return self._queue
+
+    def _run(self, records_queue: queue.Queue) -> None:
+        while True:
+            batch = [records_queue.get()]
+            while len(batch) < MAX_BATCH:
+                try:
+                    batch.append(records_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                append_scores([record for record, _ in batch])
+                if any(future is not None for _, future in batch):
+                    with db_timer('sync'):
+                        get_engine().sync()
+            except Exception as error:
+                logger.exception(f'Failed to record {len(batch)} scores')
+                for _, future in batch:
+                    if future is not None:
+                        future.set_exception(error)
+            else:
+                for _, future in batch:
+                    if future is not None:
+                        future.set_result(None)
+            finally:
+                for _ in batch:
+                    records_queue.task_done()
+
+    def submit(self, record: dict) -> None:
+        """
+        Queues a record, and with 'fsync' durability waits until it is on disk.
+        """
+        if self.durability == 'enqueue':
+            self._get_queue().put((record, None))
+        else:
+            future = Future()
+            self._get_queue().put((record, future))
+            future.result()
+
+    def flush(self) -> None:
+        """
+        Waits until every record queued by this process has been written.
+        """
+        with self._lock:
+            records_queue = self._queue if self._pid == os.getpid() else None
+        if records_queue is not None:
+            records_queue.join()
+
+_writer = ScoreWriter()
+
+def flush() -> None:
+    """
+    Waits until every recorded score of this process has been written. Runs at interpreter exit.
+    """
+    _writer.flush()
+
+atexit.register(flush)
+
+def record_score(timestamp: str, username: str, difficulty: str, operator: str, score: int) -> None:
+    """
+    Records the score of a finished game. The record is written by a background writer, so the
+    caller returns once it is queued, or once it is on disk with 'fsync' durability.
+    """
+    _writer.submit({
+        'timestamp': str(timestamp),
+        'username': username,
+        'difficulty': difficulty,
+        'operator': operator,
+        'score': int(score),
+    })
+
+def compact(today: datetime.date | None = None) -> int:
+    """
+    Rolls games played more than SCOREBOARD_RAW_DAYS days ago into daily score counts and the
+    highest SCOREBOARD_TOP_K games per day and category, then removes their raw rows. Leaderboards
+    and statistics stay exact, since they only need those aggregates of old games. Aggregates older
+    than SCOREBOARD_HISTORY_DAYS are then expired, if set. Returns the number of games compacted.
+    """
+    # Imported here as the leaderboard is built on scoreboard_db
+    from leaderboard import LEADERBOARD_SIZE
+
+    if SCOREBOARD_RAW_DAYS < 1:
+        raise ValueError('Raw scores must be kept at least one day')
+    if SCOREBOARD_TOP_K < LEADERBOARD_SIZE:
+        raise ValueError(f'At least the {LEADERBOARD_SIZE} highest games of each day must be kept, not {SCOREBOARD_TOP_K}')
+    today = today or datetime.date.today()
+    before = (today - datetime.timedelta(days=SCOREBOARD_RAW_DAYS)).isoformat()
+    engine = get_engine()
+    with db_timer('compact'):
+        compacted = _history.compact(engine, before, SCOREBOARD_TOP_K)
+        if SCOREBOARD_HISTORY_DAYS > 0:
+            _history.expire((today - datetime.timedelta(days=SCOREBOARD_HISTORY_DAYS)).isoformat())
+    return compacted
+
+def start_compaction(interval: float = SCOREBOARD_COMPACT_INTERVAL) -> None:
+    """
+    Compacts the scoreboard every interval seconds from a background thread, if interval is set.
+    Compactions of several processes are serialised and each game is compacted once.
+    """
+    if interval <= 0:
+        return
+
+    def run() -> None:
+        while True:
+            try:
+                compact()
+            except Exception:
+                logger.exception('Failed to compact the scoreboard')
+            time.sleep(interval)
+
+    threading.Thread(target=run, name='scoreboard-compaction', daemon=True).start()
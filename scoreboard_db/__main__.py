@@ -0,0 +1,22 @@
+# Compacts the scoreboard once, e.g. from cron:
+#   python -m scoreboard_db compact
+# Retention is configured by the same environment variables as the app.
+
+# Import libraries
+import argparse
+
+import scoreboard_db
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog='python -m scoreboard_db', description='Maintain the MathSprint scoreboard.'
+    )
+    parser.add_argument('command', choices=['compact'], help='compact: roll old games into daily aggregates')
+    parser.parse_args()
+
+    compacted = scoreboard_db.compact()
+    scoreboard_db.flush()
+    print(f'Compacted {compacted} games played more than {scoreboard_db.SCOREBOARD_RAW_DAYS} days ago')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+# Import libraries
+import io
+import os
+import csv
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+SCOREBOARD_COLUMNS = ['timestamp', 'username', 'difficulty', 'operator', 'score']
+
+class FileLock:
+    """
+    Exclusive lock on a sidecar lock file shared by every process writing the given path.
+    Falls back to no cross-process locking on platforms without fcntl.
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path + '.lock'
+
+    def __enter__(self) -> 'FileLock':
+        self._file = open(self.path, 'a')
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+
+def fsync_path(path: str) -> None:
+    """
+    Flushes a file or directory to disk, so that data written to it survives a power loss.
+    """
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class CSVEngine:
+    """
+    Stores the scoreboard as a flat csv file. Queries load the whole file.
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def read(self) -> pd.DataFrame:
+        """
+        Reads scoreboard csv and returns pandas dataframe.
+        """
+        if not os.path.exists(self.path):
+            return pd.DataFrame(columns=SCOREBOARD_COLUMNS)
+        return pd.read_csv(self.path)
+
+    def version(self) -> tuple[int, int]:
+        """
+        Returns the inode and size of the scoreboard csv. Appends grow the file in place, while a
+        write replaces it with a new inode.
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return (0, 0)
+        return (stat.st_ino, stat.st_size)
+
+    def changes_since(self, version: tuple[int, int] | None) -> tuple[list[dict] | None, tuple[int, int]]:
+        """
+        Returns the records appended since a version, or since the scoreboard was created if it is
+        None, and the version they reach, parsing only the bytes added since. The records are None
+        if the csv was replaced since.
+        """
+        current = self.version()
+        if version is None:
+            version = (current[0], 0)
+        if version[0] != current[0] or version[1] > current[1]:
+            return None, current
+        if version == current:
+            return [], current
+
+        with open(self.path, 'rb') as f:
+            f.seek(version[1])
+            data = f.read(current[1] - version[1])
+        # Only whole lines are read, a line being appended is read next time
+        data = data[:data.rfind(b'\n') + 1]
+        lines = data.decode('utf-8').splitlines()
+        if version[1] == 0 and lines:
+            lines = lines[1:]
+        records = [
+            dict(zip(SCOREBOARD_COLUMNS, row)) for row in csv.reader(lines) if row
+        ]
+        for record in records:
+            record['score'] = int(record['score'])
+        return records, (version[0], version[1] + len(data))
+
+    def write(self, df_scoreboard: pd.DataFrame) -> None:
+        """
+        Writes a Pandas DataFrame to scoreboard csv, replacing its content atomically.
+        """
+        with FileLock(self.path):
+            tmp_path = self.path + '.tmp'
+            df_scoreboard.to_csv(tmp_path, index=False)
+            os.replace(tmp_path, self.path)
+
+    def append(self, records: list[dict]) -> tuple[tuple, tuple]:
+        """
+        Appends records to the scoreboard csv in a single write. Only the new rows are written, so
+        the cost does not grow with the size of the scoreboard. Returns the versions of the
+        scoreboard immediately before and after the append.
+        """
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=SCOREBOARD_COLUMNS, lineterminator='\n')
+        for record in records:
+            writer.writerow(record)
+
+        with FileLock(self.path):
+            before = self.version()
+            with open(self.path, 'a+b') as f:
+                f.seek(0, os.SEEK_END)
+                prefix = ''
+                if f.tell() == 0:
+                    prefix = ','.join(SCOREBOARD_COLUMNS) + '\n'
+                else:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        prefix = '\n'
+                f.write((prefix + buffer.getvalue()).encode('utf-8'))
+                f.flush()
+            return before, self.version()
+
+    def delete_before(self, day: str) -> int:
+        """
+        Removes the scores of games played before a day, replacing the csv atomically. Returns the
+        number of scores removed.
+        """
+        with FileLock(self.path):
+            df_scoreboard = self.read()
+            keep = pd.to_datetime(df_scoreboard['timestamp']) >= pd.Timestamp(day)
+            if keep.all():
+                return 0
+            tmp_path = self.path + '.tmp'
+            df_scoreboard[keep].to_csv(tmp_path, index=False)
+            os.replace(tmp_path, self.path)
+            return int((~keep).sum())
+
+    def sync(self) -> None:
+        """
+        Flushes the scoreboard csv to disk.
+        """
+        if os.path.exists(self.path):
+            fsync_path(self.path)
+
+    def scores(self, difficulty: str, operator: str) -> pd.DataFrame:
+        """
+        Returns every score of a category.
+        """
+        df_scoreboard = self.read()
+        df_scoreboard = df_scoreboard[df_scoreboard['difficulty'] == difficulty]
+        df_scoreboard = df_scoreboard[df_scoreboard['operator'] == operator]
+        return df_scoreboard
+
+    def top_scores(self, difficulty: str, operator: str, limit: int) -> pd.DataFrame:
+        """
+        Returns the highest scores of a category in descending order.
+        """
+        df_scoreboard = self.scores(difficulty, operator)
+        return df_scoreboard.sort_values(by=['score'], ascending=False).head(limit)
+
+    def score_counts(self) -> pd.DataFrame:
+        """
+        Returns the number of games per (difficulty, operator, score).
+        """
+        df_scoreboard = self.read()
+        return (
+            df_scoreboard.groupby(['difficulty', 'operator', 'score']).size()
+            .reset_index(name='count')
+        )
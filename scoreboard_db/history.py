@@ -0,0 +1,190 @@
+# Import libraries
+import os
+import sqlite3
+import threading
+import pandas as pd
+
+from scoreboard_db.csv_engine import SCOREBOARD_COLUMNS
+
+class ScoreHistory:
+    """
+    Compacted scoreboard history in a SQLite database: the number of games per day, category and
+    score, and the highest top_k games per day and category. These are all the scoreboard page
+    needs of old games, as a game outside the top_k of its day cannot rank in the leaderboard.
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Connections are per thread and are not reused by a forked worker process
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            with conn:
+                conn.execute(
+                    '''
+                    CREATE TABLE IF NOT EXISTS daily_counts (
+                        day TEXT NOT NULL,
+                        difficulty TEXT NOT NULL,
+                        operator TEXT NOT NULL,
+                        score INTEGER NOT NULL,
+                        count INTEGER NOT NULL,
+                        PRIMARY KEY (day, difficulty, operator, score)
+                    )
+                    '''
+                )
+                conn.execute(
+                    '''
+                    CREATE TABLE IF NOT EXISTS daily_top (
+                        timestamp TEXT NOT NULL,
+                        username TEXT NOT NULL,
+                        difficulty TEXT NOT NULL,
+                        operator TEXT NOT NULL,
+                        score INTEGER NOT NULL
+                    )
+                    '''
+                )
+                conn.execute(
+                    '''
+                    CREATE INDEX IF NOT EXISTS idx_daily_top_category_score
+                    ON daily_top (difficulty, operator, score DESC)
+                    '''
+                )
+                conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+                conn.execute("INSERT OR IGNORE INTO meta VALUES ('version', '0')")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _bump_version(self, conn: sqlite3.Connection) -> None:
+        conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'version'")
+
+    def bump_version(self) -> None:
+        """
+        Increments the version for a change of the raw scores that is not an append, such as a
+        rewrite or the removal of compacted games.
+        """
+        conn = self._connect()
+        with conn:
+            self._bump_version(conn)
+
+    def version(self) -> int:
+        """
+        Returns a counter incremented whenever aggregates are added or expired, or the raw scores
+        are changed other than by an append, or 0 if neither ever happened.
+        """
+        if not self.exists():
+            return 0
+        row = self._connect().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return int(row[0])
+
+    def _pending_before(self, conn: sqlite3.Connection) -> str | None:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'pending_before'").fetchone()
+        return row[0] if row else None
+
+    def _remove_compacted(self, engine, before: str) -> None:
+        """
+        Removes the raw games of a compaction from an engine and then its pending marker.
+        """
+        if engine.delete_before(before):
+            conn = self._connect()
+            with conn:
+                self._bump_version(conn)
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM meta WHERE key = 'pending_before' AND value = ?", (before,))
+
+    def compact(self, engine, before: str, top_k: int) -> int:
+        """
+        Rolls every game of an engine played before a day into daily aggregates, adding to those of
+        days compacted before, e.g. for games restored or migrated after their day was compacted,
+        and then removes their raw rows. Aggregates are committed along with a pending marker
+        that is cleared once the raw rows are gone, so a compaction interrupted in between removes
+        them first when run again and counts nothing twice. Concurrent compactions are serialised
+        by the database write lock. Returns the number of games compacted.
+        """
+        conn = self._connect()
+        pending_before = self._pending_before(conn)
+        if pending_before is not None:
+            self._remove_compacted(engine, pending_before)
+
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            # Another compaction added its aggregates meanwhile and removes their raw rows itself
+            if self._pending_before(conn) is not None:
+                return 0
+
+            df_scoreboard = engine.read()
+            df_scoreboard = df_scoreboard.astype({'username': str, 'difficulty': str, 'operator': str})
+            df_scoreboard['timestamp'] = pd.to_datetime(df_scoreboard['timestamp']).dt.strftime('%Y-%m-%d')
+            df_old = df_scoreboard[df_scoreboard['timestamp'] < before]
+            if len(df_old) == 0:
+                return 0
+
+            df_counts = (
+                df_old.groupby(['timestamp', 'difficulty', 'operator', 'score']).size()
+                .reset_index(name='count')
+            )
+            conn.executemany(
+                '''
+                INSERT INTO daily_counts VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (day, difficulty, operator, score) DO UPDATE SET count = count + excluded.count
+                ''',
+                df_counts.itertuples(index=False),
+            )
+            df_top = (
+                df_old.sort_values('score', ascending=False, kind='stable')
+                .groupby(['timestamp', 'difficulty', 'operator']).head(top_k)
+            )
+            conn.executemany(
+                'INSERT INTO daily_top VALUES (?, ?, ?, ?, ?)', df_top[SCOREBOARD_COLUMNS].itertuples(index=False)
+            )
+            conn.execute("INSERT INTO meta VALUES ('pending_before', ?)", (before,))
+            self._bump_version(conn)
+
+        self._remove_compacted(engine, before)
+        return len(df_old)
+
+    def expire(self, before: str) -> None:
+        """
+        Removes the aggregates of days before a day.
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            deleted = conn.execute('DELETE FROM daily_counts WHERE day < ?', (before,)).rowcount
+            conn.execute('DELETE FROM daily_top WHERE timestamp < ?', (before,))
+            if deleted:
+                self._bump_version(conn)
+
+    def top_scores(self, difficulty: str, operator: str, limit: int) -> pd.DataFrame:
+        """
+        Returns the highest compacted scores of a category in descending order.
+        """
+        return pd.read_sql_query(
+            f'''
+            SELECT {", ".join(SCOREBOARD_COLUMNS)} FROM daily_top
+            WHERE difficulty = ? AND operator = ?
+            ORDER BY score DESC
+            LIMIT ?
+            ''',
+            self._connect(),
+            params=(difficulty, operator, limit),
+        )
+
+    def score_counts(self) -> pd.DataFrame:
+        """
+        Returns the number of compacted games per (difficulty, operator, score).
+        """
+        return pd.read_sql_query(
+            '''
+            SELECT difficulty, operator, score, SUM(count) AS count FROM daily_counts
+            GROUP BY difficulty, operator, score
+            ''',
+            self._connect(),
+        )
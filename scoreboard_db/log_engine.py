@@ -0,0 +1,282 @@
+# Import libraries
+import os
+import json
+import mmap
+import threading
+import numpy as np
+import pandas as pd
+
+from scoreboard_db.csv_engine import FileLock, SCOREBOARD_COLUMNS, fsync_path
+
+# Fixed-width record of a game: days since 1970-01-01, username id, score and category id
+RECORD_DTYPE = np.dtype([
+    ('day', '<i4'),
+    ('user', '<u4'),
+    ('score', '<i4'),
+    ('category', 'u1'),
+    ('padding', 'V3'),
+])
+
+class LogEngine:
+    """
+    Stores the scoreboard as an append-only log of fixed-width binary records. Usernames and
+    (difficulty, operator) categories are interned in a sidecar symbol file of JSON lines, whose
+    ids never change. Reads map the log with mmap and view it as a numpy record array without
+    parsing, so filters, top scores and counts are vectorised over the page cache shared by every
+    process. Rows of the legacy csv are migrated on first use.
+    """
+    def __init__(self, path: str, csv_path: str | None = None) -> None:
+        self.path = path
+        self.symbols_path = path + '.symbols'
+        self._users = []
+        self._user_ids = {}
+        self._categories = []
+        self._category_ids = {}
+        self._symbols_size = 0
+        self._view = None
+        self._view_key = None
+        self._lock = threading.Lock()
+
+        with FileLock(self.path):
+            if not os.path.exists(self.path):
+                df_scoreboard = pd.DataFrame(columns=SCOREBOARD_COLUMNS)
+                if csv_path is not None and os.path.exists(csv_path):
+                    df_scoreboard = pd.read_csv(csv_path)
+                self._replace(df_scoreboard)
+
+    def _load_symbols(self) -> None:
+        """
+        Reads symbols appended to the symbol file since it was last read.
+        """
+        try:
+            size = os.path.getsize(self.symbols_path)
+        except FileNotFoundError:
+            return
+        if size == self._symbols_size:
+            return
+        with open(self.symbols_path, 'rb') as f:
+            f.seek(self._symbols_size)
+            data = f.read(size - self._symbols_size)
+        # Only whole lines are read, a line being written is read next time
+        data = data[:data.rfind(b'\n') + 1]
+        for line in data.decode('utf-8').splitlines():
+            kind, *value = json.loads(line)
+            if kind == 'u':
+                self._user_ids[value[0]] = len(self._users)
+                self._users.append(value[0])
+            else:
+                self._category_ids[tuple(value)] = len(self._categories)
+                self._categories.append(tuple(value))
+        self._symbols_size += len(data)
+
+    def _encode(self, df_scoreboard: pd.DataFrame) -> np.ndarray:
+        """
+        Converts scoreboard rows to records, interning new usernames and categories. Must hold the
+        file lock.
+        """
+        with self._lock:
+            self._load_symbols()
+            lines = []
+            users = df_scoreboard['username'].astype(str).tolist()
+            for user in dict.fromkeys(users):
+                if user not in self._user_ids:
+                    self._user_ids[user] = len(self._users)
+                    self._users.append(user)
+                    lines.append(json.dumps(['u', user]))
+            categories = list(zip(
+                df_scoreboard['difficulty'].astype(str).tolist(), df_scoreboard['operator'].astype(str).tolist()
+            ))
+            for category in dict.fromkeys(categories):
+                if category not in self._category_ids:
+                    self._category_ids[category] = len(self._categories)
+                    self._categories.append(category)
+                    lines.append(json.dumps(['c', *category]))
+            if lines:
+                data = ('\n'.join(lines) + '\n').encode('utf-8')
+                with open(self.symbols_path, 'ab') as f:
+                    f.write(data)
+                self._symbols_size += len(data)
+
+            records = np.zeros(len(df_scoreboard), dtype=RECORD_DTYPE)
+            days = pd.to_datetime(df_scoreboard['timestamp']).values.astype('datetime64[D]')
+            records['day'] = days.astype(np.int32)
+            records['user'] = [self._user_ids[user] for user in users]
+            records['score'] = df_scoreboard['score'].to_numpy(dtype=np.int32)
+            records['category'] = [self._category_ids[category] for category in categories]
+            return records
+
+    def _replace(self, df_scoreboard: pd.DataFrame) -> None:
+        """
+        Replaces the log atomically with the records of scoreboard rows. Must hold the file lock.
+        """
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(self._encode(df_scoreboard).tobytes())
+        os.replace(tmp_path, self.path)
+
+    def _records(self) -> np.ndarray:
+        """
+        Returns a read-only record view of the mapped log, mapped again only once the log changed.
+        """
+        with self._lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                return np.zeros(0, dtype=RECORD_DTYPE)
+            key = (stat.st_ino, stat.st_size)
+            if key != self._view_key:
+                count = stat.st_size // RECORD_DTYPE.itemsize
+                if count == 0:
+                    self._view = np.zeros(0, dtype=RECORD_DTYPE)
+                else:
+                    with open(self.path, 'rb') as f:
+                        buffer = mmap.mmap(f.fileno(), count * RECORD_DTYPE.itemsize, access=mmap.ACCESS_READ)
+                    self._view = np.frombuffer(buffer, dtype=RECORD_DTYPE, count=count)
+                self._view_key = key
+            view = self._view
+            # Records of the view are interned before they are written, so their symbols can be read
+            self._load_symbols()
+            return view
+
+    def _category_mask(self, records: np.ndarray, difficulty: str, operator: str) -> np.ndarray:
+        code = self._category_ids.get((difficulty, operator))
+        if code is None:
+            return np.zeros(len(records), dtype=bool)
+        return records['category'] == code
+
+    def _to_frame(self, records: np.ndarray) -> pd.DataFrame:
+        """
+        Converts records to scoreboard rows, with categorical username, difficulty and operator.
+        """
+        columns = {
+            'timestamp': records['day'].astype('datetime64[D]'),
+            'username': pd.Categorical.from_codes(records['user'].astype(np.int64), categories=self._users),
+        }
+        for position, column in enumerate(['difficulty', 'operator']):
+            # Codes of a category id into the distinct difficulties or operators
+            values = [category[position] for category in self._categories]
+            names = list(dict.fromkeys(values))
+            codes = np.array([names.index(value) for value in values], dtype=np.int64)
+            columns[column] = pd.Categorical.from_codes(codes[records['category']], categories=names)
+        columns['score'] = records['score']
+        return pd.DataFrame(columns)
+
+    def version(self) -> tuple[int, int]:
+        """
+        Returns a token that changes whenever the log is appended to or replaced.
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return (0, 0)
+        return (stat.st_ino, stat.st_size // RECORD_DTYPE.itemsize)
+
+    def changes_since(self, version: tuple[int, int] | None) -> tuple[list[dict] | None, tuple[int, int]]:
+        """
+        Returns the records appended since a version, or since the scoreboard was created if it is
+        None, and the version they reach, sliced from the mapped log. The records are None if the
+        log was replaced since.
+        """
+        records = self._records()
+        current = self.version()
+        if version is None:
+            version = (current[0], 0)
+        # The view may have been mapped before an append that the version already counts
+        count = min(current[1], len(records))
+        if version[0] != current[0] or version[1] > count:
+            return None, current
+        df_records = self._to_frame(records[version[1]:count]).astype(
+            {'timestamp': str, 'username': str, 'difficulty': str, 'operator': str, 'score': int}
+        )
+        return df_records.to_dict('records'), (version[0], count)
+
+    def read(self) -> pd.DataFrame:
+        """
+        Returns every score as a pandas dataframe.
+        """
+        return self._to_frame(self._records())
+
+    def write(self, df_scoreboard: pd.DataFrame) -> None:
+        """
+        Replaces every score with the rows of a Pandas DataFrame.
+        """
+        with FileLock(self.path):
+            self._replace(df_scoreboard)
+
+    def append(self, records: list[dict]) -> tuple[tuple, tuple]:
+        """
+        Appends records to the log in a single write. A record torn by a crash is cut off first so
+        that records stay aligned. Returns the versions of the scoreboard immediately before and
+        after the append.
+        """
+        with FileLock(self.path):
+            before = self.version()
+            data = self._encode(pd.DataFrame(records, columns=SCOREBOARD_COLUMNS)).tobytes()
+            with open(self.path, 'r+b') as f:
+                size = f.seek(0, os.SEEK_END)
+                if size % RECORD_DTYPE.itemsize:
+                    f.truncate(size - size % RECORD_DTYPE.itemsize)
+                    f.seek(0, os.SEEK_END)
+                f.write(data)
+                f.flush()
+            return before, self.version()
+
+    def delete_before(self, day: str) -> int:
+        """
+        Removes the records of games played before a day, replacing the log atomically. Interned
+        symbols are kept, as ids never change. Returns the number of records removed.
+        """
+        with FileLock(self.path):
+            records = self._records()
+            keep = records['day'] >= np.datetime64(day, 'D').astype(np.int32)
+            deleted = int(len(records) - keep.sum())
+            if deleted:
+                tmp_path = self.path + '.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(records[keep].tobytes())
+                os.replace(tmp_path, self.path)
+            return deleted
+
+    def sync(self) -> None:
+        """
+        Flushes the symbol file and the log to disk.
+        """
+        for path in [self.symbols_path, self.path]:
+            if os.path.exists(path):
+                fsync_path(path)
+
+    def top_scores(self, difficulty: str, operator: str, limit: int) -> pd.DataFrame:
+        """
+        Returns the highest scores of a category in descending order, selected with a partial sort
+        of the category's scores.
+        """
+        records = self._records()
+        positions = np.flatnonzero(self._category_mask(records, difficulty, operator))
+        scores = records['score'][positions]
+        if len(scores) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            positions, scores = positions[top], scores[top]
+        top_records = records[positions[np.argsort(-scores, kind='stable')]]
+        return pd.DataFrame({
+            'timestamp': np.datetime_as_string(top_records['day'].astype('datetime64[D]')),
+            'username': [self._users[user] for user in top_records['user'].tolist()],
+            'difficulty': difficulty,
+            'operator': operator,
+            'score': top_records['score'].astype(int),
+        }, columns=SCOREBOARD_COLUMNS)
+
+    def score_counts(self) -> pd.DataFrame:
+        """
+        Returns the number of games per (difficulty, operator, score).
+        """
+        records = self._records()
+        frames = []
+        for code, (difficulty, operator) in enumerate(self._categories):
+            scores, counts = np.unique(records['score'][records['category'] == code], return_counts=True)
+            if len(scores):
+                frames.append(pd.DataFrame({
+                    'difficulty': difficulty, 'operator': operator, 'score': scores.astype(int), 'count': counts,
+                }))
+        if not frames:
+            return pd.DataFrame(columns=['difficulty', 'operator', 'score', 'count'])
+        return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,226 @@
+# Import libraries
+import os
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+from scoreboard_db.csv_engine import FileLock, SCOREBOARD_COLUMNS, fsync_path
+
+# Fragments written by appends before they are merged into one sorted file
+MAX_FRAGMENTS = 32
+
+# Rows per row group of merged files, so filters on a category skip the row groups of the others
+ROW_GROUP_SIZE = 65536
+
+# Marker of a migrated legacy csv, ignored by datasets like every file starting with '_'
+CSV_MIGRATED = '_csv_migrated'
+
+def scoreboard_schema() -> 'pa.Schema':
+    """
+    Returns the typed schema of the scoreboard: repeated strings are dictionary encoded, the
+    timestamp is a date and the score an int32.
+    """
+    return pa.schema([
+        ('timestamp', pa.date32()),
+        ('username', pa.dictionary(pa.int32(), pa.string())),
+        ('difficulty', pa.dictionary(pa.int8(), pa.string())),
+        ('operator', pa.dictionary(pa.int8(), pa.string())),
+        ('score', pa.int32()),
+    ])
+
+class ParquetEngine:
+    """
+    Stores the scoreboard as a directory of Parquet files with typed, dictionary encoded columns.
+    Every append writes a small fragment, and fragments are merged into one file sorted by category
+    and score once there are more than MAX_FRAGMENTS. Queries read only the columns they need, and
+    category filters are pushed down to skip row groups of other categories. Requires pyarrow.
+    Rows of the legacy csv are migrated on first use.
+    """
+    def __init__(self, path: str, csv_path: str | None = None) -> None:
+        if pa is None:
+            raise ImportError('The parquet scoreboard engine requires pyarrow')
+        self.path = path
+        self.schema = scoreboard_schema()
+        os.makedirs(path, exist_ok=True)
+
+        if csv_path is not None:
+            self._migrate_csv(csv_path)
+
+    def _fragments(self) -> list[str]:
+        return sorted(
+            name for name in os.listdir(self.path) if name.startswith('part-') and name.endswith('.parquet')
+        )
+
+    def _migrate_csv(self, csv_path: str) -> None:
+        """
+        Copies the rows of the legacy scoreboard csv into the dataset exactly once.
+        """
+        marker = os.path.join(self.path, CSV_MIGRATED)
+        with FileLock(self.path):
+            if os.path.exists(marker):
+                return
+            if os.path.exists(csv_path):
+                self._write_fragment(self._to_table(pd.read_csv(csv_path)), self._fragments())
+            open(marker, 'w').close()
+
+    def _to_table(self, df_scoreboard: pd.DataFrame) -> 'pa.Table':
+        """
+        Converts scoreboard rows to a table of the scoreboard schema.
+        """
+        df_scoreboard = df_scoreboard[SCOREBOARD_COLUMNS].copy()
+        df_scoreboard['timestamp'] = pd.to_datetime(df_scoreboard['timestamp']).values.astype('datetime64[D]')
+        return pa.Table.from_pandas(df_scoreboard, schema=self.schema, preserve_index=False)
+
+    def _write_fragment(self, table: 'pa.Table', fragments: list[str], replace: bool = False) -> None:
+        """
+        Writes a table as the next fragment, sorted by category and descending score. With replace,
+        the given fragments are removed once the new one is in place. Must hold the file lock.
+        """
+        keys = pa.table({
+            'difficulty': table['difficulty'].cast(pa.string()),
+            'operator': table['operator'].cast(pa.string()),
+            'score': table['score'],
+        })
+        table = table.take(pc.sort_indices(
+            keys, [('difficulty', 'ascending'), ('operator', 'ascending'), ('score', 'descending')]
+        ))
+
+        sequence = int(fragments[-1][5:-8]) + 1 if fragments else 1
+        path = os.path.join(self.path, f'part-{sequence:012d}.parquet')
+        tmp_path = os.path.join(self.path, f'_part-{sequence:012d}.parquet.tmp')
+        pq.write_table(table, tmp_path, row_group_size=ROW_GROUP_SIZE)
+        os.replace(tmp_path, path)
+        if replace:
+            for name in fragments:
+                os.remove(os.path.join(self.path, name))
+
+    def _read(self, columns: list[str] | None = None, difficulty: str | None = None,
+              operator: str | None = None) -> 'pa.Table':
+        """
+        Reads the given columns of every score, or of the scores of a category, with the
+        dictionaries of every fragment unified.
+        """
+        expression = None
+        if difficulty is not None:
+            expression = (ds.field('difficulty') == difficulty) & (ds.field('operator') == operator)
+
+        # Fragments listed here may be removed by a merge in another process before they are read
+        for attempt in range(3):
+            paths = [os.path.join(self.path, name) for name in self._fragments()]
+            try:
+                dataset = ds.dataset(paths, schema=self.schema, format='parquet')
+                return dataset.to_table(columns=columns, filter=expression).unify_dictionaries()
+            except FileNotFoundError:
+                if attempt == 2:
+                    raise
+
+    def version(self) -> tuple[int, int]:
+        """
+        Returns a token that changes whenever a fragment is written or fragments are merged.
+        """
+        fragments = self._fragments()
+        if not fragments:
+            return (0, 0)
+        return (int(fragments[-1][5:-8]), len(fragments))
+
+    def changes_since(self, version: tuple[int, int] | None) -> tuple[list[dict] | None, tuple[int, int]]:
+        """
+        Returns the records appended since a version, or since the scoreboard was created if it is
+        None, and the current version, read from the fragments written since only. The records are
+        None if fragments were merged or replaced since. Holds the file lock, so a merge is never
+        seen halfway.
+        """
+        with FileLock(self.path):
+            fragments = self._fragments()
+            current = self.version()
+            sequence, count = version if version is not None else (0, 0)
+            new_fragments = [name for name in fragments if int(name[5:-8]) > sequence]
+            if len(fragments) - len(new_fragments) != count:
+                return None, current
+            if not new_fragments:
+                return [], current
+            paths = [os.path.join(self.path, name) for name in new_fragments]
+            table = ds.dataset(paths, schema=self.schema, format='parquet').to_table().unify_dictionaries()
+        df_records = table.to_pandas().astype(
+            {'timestamp': str, 'username': str, 'difficulty': str, 'operator': str, 'score': int}
+        )
+        return df_records.to_dict('records'), current
+
+    def read(self) -> pd.DataFrame:
+        """
+        Returns every score as a pandas dataframe with categorical string columns.
+        """
+        return self._read().to_pandas()
+
+    def write(self, df_scoreboard: pd.DataFrame) -> None:
+        """
+        Replaces every score with the rows of a Pandas DataFrame.
+        """
+        table = self._to_table(df_scoreboard)
+        with FileLock(self.path):
+            self._write_fragment(table, self._fragments(), replace=True)
+
+    def append(self, records: list[dict]) -> tuple[tuple, tuple]:
+        """
+        Writes records as a new fragment, merging every fragment once there are too many. Returns
+        the versions of the scoreboard immediately before and after the append.
+        """
+        table = self._to_table(pd.DataFrame(records, columns=SCOREBOARD_COLUMNS))
+        with FileLock(self.path):
+            before = self.version()
+            self._write_fragment(table, self._fragments())
+            fragments = self._fragments()
+            if len(fragments) > MAX_FRAGMENTS:
+                self._write_fragment(self._read(), fragments, replace=True)
+            return before, self.version()
+
+    def delete_before(self, day: str) -> int:
+        """
+        Removes the scores of games played before a day by merging every fragment into one without
+        them. Returns the number of scores removed.
+        """
+        with FileLock(self.path):
+            fragments = self._fragments()
+            table = self._read()
+            keep = pc.greater_equal(table['timestamp'], pa.scalar(pd.Timestamp(day).date(), pa.date32()))
+            deleted = len(table) - pc.sum(keep).as_py() if len(table) else 0
+            if deleted:
+                self._write_fragment(table.filter(keep), fragments, replace=True)
+            return deleted
+
+    def sync(self) -> None:
+        """
+        Flushes every fragment and the directory listing them to disk.
+        """
+        for name in self._fragments():
+            fsync_path(os.path.join(self.path, name))
+        fsync_path(self.path)
+
+    def top_scores(self, difficulty: str, operator: str, limit: int) -> pd.DataFrame:
+        """
+        Returns the highest scores of a category in descending order, with plain string columns
+        like the records appended to the scoreboard.
+        """
+        table = self._read(SCOREBOARD_COLUMNS, difficulty, operator)
+        if len(table) > 0:
+            scores = pa.table({'score': table['score']})
+            table = table.take(pc.select_k_unstable(scores, min(limit, len(table)), [('score', 'descending')]))
+        df_top = table.to_pandas()
+        return df_top.astype({'timestamp': str, 'username': str, 'difficulty': str, 'operator': str, 'score': int})
+
+    def score_counts(self) -> pd.DataFrame:
+        """
+        Returns the number of games per (difficulty, operator, score), read from those columns only.
+        """
+        table = self._read(['difficulty', 'operator', 'score'])
+        df_counts = (
+            table.group_by(['difficulty', 'operator', 'score']).aggregate([('score', 'count')]).to_pandas()
+            .rename(columns={'score_count': 'count'})[['difficulty', 'operator', 'score', 'count']]
+        )
+        return df_counts.astype({'difficulty': str, 'operator': str, 'score': int, 'count': int})
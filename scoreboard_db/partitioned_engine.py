@@ -0,0 +1,228 @@
+# Import libraries
+import os
+import re
+import json
+import threading
+import pandas as pd
+
+from scoreboard_db.csv_engine import CSVEngine, FileLock, SCOREBOARD_COLUMNS, fsync_path
+from scoreboard_db.sqlite_engine import SQLiteEngine
+from scoreboard_db.parquet_engine import ParquetEngine
+from scoreboard_db.log_engine import LogEngine
+
+# Engines storing one segment, with the file extension of their segments
+SEGMENT_ENGINES = {
+    'csv': (CSVEngine, '.csv'),
+    'sqlite': (SQLiteEngine, '.db'),
+    'parquet': (ParquetEngine, '.parquet'),
+    'log': (LogEngine, '.log'),
+}
+
+MANIFEST = 'manifest.json'
+
+class PartitionedEngine:
+    """
+    Stores the scoreboard of every (difficulty, operator) category in its own segment, an engine
+    over a separate file, listed in a small JSON manifest. The leaderboard and histogram of a
+    category touch only its segment, and games of different categories are written without
+    contending on one file lock. Rows of the legacy csv are migrated on first use.
+    """
+    def __init__(self, path: str, segment_engine: str = 'log', csv_path: str | None = None) -> None:
+        if segment_engine not in SEGMENT_ENGINES:
+            raise ValueError(f'Unknown segment engine: {segment_engine}')
+        self.path = path
+        self.manifest_path = os.path.join(path, MANIFEST)
+        self.segment_engine = segment_engine
+        self._segments = {}
+        self._manifest_key = None
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+        with FileLock(self.manifest_path):
+            if os.path.exists(self.manifest_path):
+                return
+            manifest = {'segment_engine': segment_engine, 'segments': []}
+            df_scoreboard = None
+            if csv_path is not None and os.path.exists(csv_path):
+                df_scoreboard = pd.read_csv(csv_path)
+                self._add_segments(manifest, df_scoreboard.groupby(['difficulty', 'operator']).groups)
+            self._write_manifest(manifest)
+            if df_scoreboard is not None:
+                segments = self._load_manifest()
+                for category, df_category in df_scoreboard.groupby(['difficulty', 'operator']):
+                    segments[category].write(df_category[SCOREBOARD_COLUMNS])
+
+    def _add_segments(self, manifest: dict, categories) -> bool:
+        """
+        Adds a segment to a manifest for every category it does not list yet. Returns True if any
+        was added.
+        """
+        _, extension = SEGMENT_ENGINES[manifest['segment_engine']]
+        listed = {(segment['difficulty'], segment['operator']) for segment in manifest['segments']}
+        added = False
+        for difficulty, operator in categories:
+            if (difficulty, operator) in listed:
+                continue
+            slug = re.sub(r'[^a-z0-9]+', '-', f'{difficulty}-{operator}'.lower()).strip('-')
+            manifest['segments'].append({
+                'difficulty': difficulty,
+                'operator': operator,
+                'file': f'{len(manifest["segments"]):03d}-{slug}{extension}',
+            })
+            listed.add((difficulty, operator))
+            added = True
+        return added
+
+    def _write_manifest(self, manifest: dict) -> None:
+        """
+        Replaces the manifest atomically. Must hold the manifest file lock.
+        """
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _load_manifest(self) -> dict:
+        """
+        Returns the engine of every segment by category, reading the manifest again only once it
+        was replaced.
+        """
+        with self._lock:
+            stat = os.stat(self.manifest_path)
+            key = (stat.st_ino, stat.st_mtime_ns)
+            if key != self._manifest_key:
+                with open(self.manifest_path) as f:
+                    manifest = json.load(f)
+                engine, _ = SEGMENT_ENGINES[manifest['segment_engine']]
+                for segment in manifest['segments']:
+                    category = (segment['difficulty'], segment['operator'])
+                    if category not in self._segments:
+                        self._segments[category] = engine(os.path.join(self.path, segment['file']))
+                self._manifest_key = key
+            return dict(self._segments)
+
+    def _segment(self, difficulty: str, operator: str, create: bool = False):
+        """
+        Returns the segment of a category, adding it to the manifest with create, or None.
+        """
+        segment = self._load_manifest().get((difficulty, operator))
+        if segment is not None or not create:
+            return segment
+
+        with FileLock(self.manifest_path):
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+            if self._add_segments(manifest, [(difficulty, operator)]):
+                self._write_manifest(manifest)
+        return self._load_manifest()[(difficulty, operator)]
+
+    def version(self) -> tuple:
+        """
+        Returns the versions of every segment by category.
+        """
+        return tuple(sorted(
+            (difficulty, operator, segment.version())
+            for (difficulty, operator), segment in self._load_manifest().items()
+        ))
+
+    def changes_since(self, version: tuple | None) -> tuple[list[dict] | None, tuple]:
+        """
+        Returns the records appended since a version, or since the scoreboard was created if it is
+        None, and the version they reach, read segment by segment from the changes of each. The
+        records are None if any segment was rewritten since.
+        """
+        previous = {(difficulty, operator): segment_version for difficulty, operator, segment_version in version or ()}
+        segments = self._load_manifest()
+        if not set(previous) <= set(segments):
+            return None, self.version()
+
+        records, current = [], []
+        for (difficulty, operator), segment in sorted(segments.items()):
+            segment_records, segment_version = segment.changes_since(previous.get((difficulty, operator)))
+            if segment_records is None:
+                return None, self.version()
+            records.extend(segment_records)
+            current.append((difficulty, operator, segment_version))
+        return records, tuple(current)
+
+    def read(self) -> pd.DataFrame:
+        """
+        Returns every score of every segment as a pandas dataframe.
+        """
+        frames = [segment.read() for segment in self._load_manifest().values()]
+        frames = [df_segment.astype({'difficulty': str, 'operator': str}) for df_segment in frames if len(df_segment)]
+        if not frames:
+            return pd.DataFrame(columns=SCOREBOARD_COLUMNS)
+        return pd.concat(frames, ignore_index=True)
+
+    def write(self, df_scoreboard: pd.DataFrame) -> None:
+        """
+        Replaces every score with the rows of a Pandas DataFrame, segment by segment.
+        """
+        categories = set(self._load_manifest())
+        for (difficulty, operator), df_category in df_scoreboard.groupby(['difficulty', 'operator']):
+            self._segment(difficulty, operator, create=True).write(df_category[SCOREBOARD_COLUMNS])
+            categories.discard((difficulty, operator))
+        for difficulty, operator in categories:
+            self._segment(difficulty, operator).write(pd.DataFrame(columns=SCOREBOARD_COLUMNS))
+
+    def append(self, records: list[dict]) -> tuple[tuple, tuple]:
+        """
+        Appends records to the segments of their categories, each in a single write under the lock
+        of its segment only. Returns the versions of the scoreboard immediately before and after
+        the append: segments that were not written appear with the same version in both, so a
+        write to them by another process is never mistaken for part of this append.
+        """
+        by_category = {}
+        for record in records:
+            by_category.setdefault((record['difficulty'], record['operator']), []).append(record)
+
+        versions = {}
+        for (difficulty, operator), category_records in by_category.items():
+            segment = self._segment(difficulty, operator, create=True)
+            versions[(difficulty, operator)] = segment.append(category_records)
+
+        before, after = [], []
+        for (difficulty, operator), segment in sorted(self._load_manifest().items()):
+            if (difficulty, operator) in versions:
+                segment_before, segment_after = versions[(difficulty, operator)]
+            else:
+                segment_before = segment_after = segment.version()
+            before.append((difficulty, operator, segment_before))
+            after.append((difficulty, operator, segment_after))
+        return tuple(before), tuple(after)
+
+    def delete_before(self, day: str) -> int:
+        """
+        Removes the scores of games played before a day from every segment. Returns the number of
+        scores removed.
+        """
+        return sum(segment.delete_before(day) for segment in self._load_manifest().values())
+
+    def sync(self) -> None:
+        """
+        Flushes every segment and the manifest to disk.
+        """
+        for segment in self._load_manifest().values():
+            segment.sync()
+        fsync_path(self.manifest_path)
+        fsync_path(self.path)
+
+    def top_scores(self, difficulty: str, operator: str, limit: int) -> pd.DataFrame:
+        """
+        Returns the highest scores of a category in descending order, read from its segment only.
+        """
+        segment = self._segment(difficulty, operator)
+        if segment is None:
+            return pd.DataFrame(columns=SCOREBOARD_COLUMNS)
+        return segment.top_scores(difficulty, operator, limit)
+
+    def score_counts(self) -> pd.DataFrame:
+        """
+        Returns the number of games per (difficulty, operator, score) of every segment.
+        """
+        frames = [segment.score_counts() for segment in self._load_manifest().values()]
+        frames = [df_counts for df_counts in frames if len(df_counts)]
+        if not frames:
+            return pd.DataFrame(columns=['difficulty', 'operator', 'score', 'count'])
+        return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,200 @@
+# Import libraries
+import os
+import sqlite3
+import threading
+import pandas as pd
+
+from scoreboard_db.csv_engine import SCOREBOARD_COLUMNS
+
+class SQLiteEngine:
+    """
+    Stores the scoreboard in a SQLite database. A composite index on (difficulty, operator, score)
+    turns the top scores of a category into an index range scan, and WAL mode lets scoreboard reads
+    proceed while games are being recorded. Scores are appended with increasing rowids, so the rows
+    added since a version are a range scan too. Rows of the legacy csv are migrated on first use.
+    """
+    def __init__(self, path: str, csv_path: str | None = None, synchronous: str = 'NORMAL') -> None:
+        if synchronous not in ('NORMAL', 'FULL'):
+            raise ValueError(f'Unknown SQLite synchronous mode: {synchronous}')
+        self.path = path
+        self.synchronous = synchronous
+        self._local = threading.local()
+
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                '''
+                CREATE TABLE IF NOT EXISTS scores (
+                    timestamp TEXT NOT NULL,
+                    username TEXT NOT NULL,
+                    difficulty TEXT NOT NULL,
+                    operator TEXT NOT NULL,
+                    score INTEGER NOT NULL
+                )
+                '''
+            )
+            conn.execute(
+                '''
+                CREATE INDEX IF NOT EXISTS idx_scores_category_score
+                ON scores (difficulty, operator, score DESC)
+                '''
+            )
+            conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+            conn.execute("INSERT OR IGNORE INTO meta VALUES ('generation', '0')")
+
+        if csv_path is not None:
+            self._migrate_csv(csv_path)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Connections are per thread and are not reused by a forked worker process
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(f'PRAGMA synchronous={self.synchronous}')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _migrate_csv(self, csv_path: str) -> None:
+        """
+        Copies the rows of the legacy scoreboard csv into the database exactly once.
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            migrated = conn.execute("SELECT value FROM meta WHERE key = 'csv_migrated'").fetchone()
+            if migrated is None:
+                if os.path.exists(csv_path):
+                    df_scoreboard = pd.read_csv(csv_path)
+                    conn.executemany(
+                        'INSERT INTO scores VALUES (?, ?, ?, ?, ?)',
+                        df_scoreboard[SCOREBOARD_COLUMNS].astype({'timestamp': str}).itertuples(index=False),
+                    )
+                conn.execute("INSERT INTO meta VALUES ('csv_migrated', '1')")
+                self._bump_generation(conn)
+
+    def _bump_generation(self, conn: sqlite3.Connection) -> None:
+        """
+        Increments the generation inside the current transaction, for writes other than appends.
+        """
+        conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'generation'")
+
+    def version(self) -> tuple[int, int]:
+        """
+        Returns the generation, incremented by every transaction that rewrites or removes scores,
+        and the rowid of the last score appended.
+        """
+        row = self._connect().execute(
+            "SELECT (SELECT value FROM meta WHERE key = 'generation'), (SELECT IFNULL(MAX(rowid), 0) FROM scores)"
+        ).fetchone()
+        return (int(row[0]), row[1])
+
+    def changes_since(self, version: tuple[int, int] | None) -> tuple[list[dict] | None, tuple[int, int]]:
+        """
+        Returns the records appended since a version, or since the scoreboard was created if it is
+        None, and the current version. The records are None if scores were rewritten or removed
+        since, as they cannot be told apart from an append then.
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN')
+            current = self.version()
+            if version is not None and version[0] != current[0]:
+                return None, current
+            rows = conn.execute(
+                f'SELECT {", ".join(SCOREBOARD_COLUMNS)} FROM scores WHERE rowid > ? ORDER BY rowid',
+                (version[1] if version is not None else 0,),
+            ).fetchall()
+        return [dict(zip(SCOREBOARD_COLUMNS, row)) for row in rows], current
+
+    def read(self) -> pd.DataFrame:
+        """
+        Returns every score as a pandas dataframe.
+        """
+        return pd.read_sql_query(f'SELECT {", ".join(SCOREBOARD_COLUMNS)} FROM scores', self._connect())
+
+    def write(self, df_scoreboard: pd.DataFrame) -> None:
+        """
+        Replaces every score with the rows of a Pandas DataFrame in one transaction.
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM scores')
+            conn.executemany(
+                'INSERT INTO scores VALUES (?, ?, ?, ?, ?)',
+                df_scoreboard[SCOREBOARD_COLUMNS].astype({'timestamp': str}).itertuples(index=False),
+            )
+            self._bump_generation(conn)
+
+    def append(self, records: list[dict]) -> tuple[tuple, tuple]:
+        """
+        Inserts records in a single transaction. Returns the versions of the scoreboard
+        immediately before and after the insert.
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            before = self.version()
+            conn.executemany(
+                '''
+                INSERT INTO scores VALUES (:timestamp, :username, :difficulty, :operator, :score)
+                ''',
+                records,
+            )
+            after = self.version()
+        return before, after
+
+    def delete_before(self, day: str) -> int:
+        """
+        Removes the scores of games played before a day in one transaction. Returns the number of
+        scores removed.
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            deleted = conn.execute('DELETE FROM scores WHERE timestamp < ?', (day,)).rowcount
+            if deleted:
+                self._bump_generation(conn)
+        return deleted
+
+    def sync(self) -> None:
+        """
+        Makes every committed score durable. With synchronous=FULL every commit already synced the
+        write-ahead log. With synchronous=NORMAL commits are not synced individually, so the log is
+        checkpointed into the database, which syncs both to disk. Raises OperationalError if a
+        reader kept the checkpoint from completing.
+        """
+        if self.synchronous == 'FULL':
+            return
+        busy, _, _ = self._connect().execute('PRAGMA wal_checkpoint(FULL)').fetchone()
+        if busy:
+            raise sqlite3.OperationalError(f'Checkpoint of {self.path} did not complete, the database is busy')
+
+    def top_scores(self, difficulty: str, operator: str, limit: int) -> pd.DataFrame:
+        """
+        Returns the highest scores of a category in descending order.
+        """
+        return pd.read_sql_query(
+            f'''
+            SELECT {", ".join(SCOREBOARD_COLUMNS)} FROM scores
+            WHERE difficulty = ? AND operator = ?
+            ORDER BY score DESC
+            LIMIT ?
+            ''',
+            self._connect(),
+            params=(difficulty, operator, limit),
+        )
+
+    def score_counts(self) -> pd.DataFrame:
+        """
+        Returns the number of games per (difficulty, operator, score), aggregated by the index.
+        """
+        return pd.read_sql_query(
+            '''
+            SELECT difficulty, operator, score, COUNT(*) AS count FROM scores
+            GROUP BY difficulty, operator, score
+            ''',
+            self._connect(),
+        )
@@ -0,0 +1,133 @@
+# Import libraries
+import os
+import json
+import hashlib
+import threading
+from flask import Flask, Response, request, stream_with_context
+
+import scoreboard_db
+from scoreboard_db import CATEGORIES
+
+EVENTS_PATH = '/scoreboard/events'
+
+# Seconds between keep-alive comments on idle streams
+HEARTBEAT_INTERVAL = 15.0
+
+# Seconds between checks for scores recorded by other processes while streams are open
+REFRESH_INTERVAL = 1.0
+
+# Each open stream holds a server thread, so a process keeps at most MAX_STREAMS open and answers
+# further clients at once with the current scoreboard token, to be polled every POLL_INTERVAL seconds
+MAX_STREAMS = int(os.environ.get('MATHSPRINT_EVENT_STREAMS', 4))
+POLL_INTERVAL = 5.0
+
+# Version of each category, incremented whenever its scores change
+_versions = {category: 0 for category in CATEGORIES}
+_condition = threading.Condition()
+_streams = 0
+_watcher = None
+
+def _bump(categories: set) -> None:
+    with _condition:
+        for category in categories:
+            _versions[category] += 1
+        _condition.notify_all()
+
+def _on_scores_recorded(records: list[dict]) -> None:
+    _bump({(record['difficulty'], record['operator']) for record in records} & set(_versions))
+
+def _on_reset() -> None:
+    _bump(set(_versions))
+
+scoreboard_db.subscribe(_on_scores_recorded, on_reset=_on_reset)
+
+def get_category_version(difficulty: str, operator: str) -> int:
+    """
+    Returns the version of a category, which changes whenever its scores change.
+    """
+    return _versions[(difficulty, operator)]
+
+def _watch() -> None:
+    """
+    Polls for scores recorded by other processes while at least one stream is open.
+    """
+    global _watcher
+    while True:
+        with _condition:
+            if not _streams:
+                _watcher = None
+                return
+        scoreboard_db.refresh()
+        with _condition:
+            _condition.wait(REFRESH_INTERVAL)
+
+def _scoreboard_token() -> str:
+    """
+    Returns a short token of the scoreboard version, the same in every process serving it.
+    """
+    return hashlib.sha1(repr(scoreboard_db.get_version()).encode('utf-8')).hexdigest()[:16]
+
+def _poll_event(last_event_id: str | None) -> str:
+    """
+    Returns the reply to a polling client: the current scoreboard token as the event id, which the
+    browser sends back as Last-Event-ID when it reconnects after POLL_INTERVAL seconds, and a
+    scores event if the scoreboard changed since the token it sent.
+    """
+    token = _scoreboard_token()
+    event = f'retry: {int(POLL_INTERVAL * 1000)}\nid: {token}\n'
+    if last_event_id and last_event_id != token:
+        return event + 'event: scores\ndata: {}\n\n'
+    return event + '\n'
+
+def _event_stream(last_event_id: str | None):
+    """
+    Yields a server-sent event listing the changed categories whenever scores change, and
+    keep-alive comments otherwise. Waiting streams cost no CPU. Once MAX_STREAMS are open, yields
+    a single poll reply instead and ends, so that streams never take every server thread.
+    """
+    global _streams, _watcher
+    with _condition:
+        admitted = _streams < MAX_STREAMS
+        if admitted:
+            _streams += 1
+            if _watcher is None:
+                _watcher = threading.Thread(target=_watch, daemon=True)
+                _watcher.start()
+        seen = dict(_versions)
+
+    if not admitted:
+        yield _poll_event(last_event_id)
+        return
+
+    try:
+        yield 'retry: 5000\n\n'
+        while True:
+            with _condition:
+                _condition.wait_for(lambda: _versions != seen, timeout=HEARTBEAT_INTERVAL)
+                changed = {
+                    f'{difficulty}/{operator}': version
+                    for (difficulty, operator), version in _versions.items()
+                    if seen[(difficulty, operator)] != version
+                }
+                seen = dict(_versions)
+
+            if changed:
+                yield f'event: scores\ndata: {json.dumps(changed)}\n\n'
+            else:
+                yield ': keep-alive\n\n'
+    finally:
+        with _condition:
+            _streams -= 1
+
+def init_app(server: Flask) -> None:
+    """
+    Registers the server-sent event stream of scoreboard changes on the Flask server.
+    """
+    def scoreboard_events() -> Response:
+        return Response(
+            stream_with_context(_event_stream(request.headers.get('Last-Event-ID'))),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+        )
+
+    server.add_url_rule(EVENTS_PATH, 'scoreboard_events', scoreboard_events)
@@ -0,0 +1,55 @@
+# Import libraries
+import datetime
+import pandas as pd
+import pytest
+
+import scoreboard_db
+from scoreboard_db.history import ScoreHistory
+from scoreboard_db.sqlite_engine import SQLiteEngine
+
+TODAY = datetime.date(2024, 6, 1)
+
+@pytest.fixture
+def scoreboard(tmp_path, monkeypatch):
+    monkeypatch.setattr(scoreboard_db, '_history', ScoreHistory(str(tmp_path / 'history.db')))
+    monkeypatch.setattr(scoreboard_db, 'SCOREBOARD_RAW_DAYS', 30)
+    monkeypatch.setattr(scoreboard_db, 'SCOREBOARD_HISTORY_DAYS', 0)
+    monkeypatch.setattr(scoreboard_db, '_engine', None)
+    monkeypatch.setattr(scoreboard_db, '_observed_version', None)
+    scoreboard_db.set_engine(SQLiteEngine(str(tmp_path / 'scoreboard.db')))
+    return scoreboard_db
+
+def game(days_ago: int, score: int) -> dict:
+    timestamp = (TODAY - datetime.timedelta(days=days_ago)).isoformat()
+    return {'timestamp': timestamp, 'username': 'player', 'difficulty': 'Normal', 'operator': 'Addition', 'score': score}
+
+def crash(day: str) -> int:
+    raise RuntimeError('Crashed')
+
+def test_compact_keeps_rows_older_than_watermark(scoreboard):
+    scoreboard.write_scoreboard(pd.DataFrame([game(40, 5)]))
+    assert scoreboard.compact(TODAY) == 1
+
+    # A game restored after its day was compacted must be compacted too, not dropped
+    df_restored = pd.DataFrame([game(45, 77), game(1, 3)])
+    scoreboard.write_scoreboard(df_restored)
+    assert scoreboard.compact(TODAY) == 1
+
+    assert list(scoreboard.get_top_scores('Normal', 'Addition').score) == [77, 5, 3]
+    assert scoreboard.get_score_counts()['count'].sum() == 3
+    assert len(scoreboard.get_scoreboard()) == 1
+
+def test_interrupted_compaction_counts_games_once(scoreboard, monkeypatch):
+    scoreboard.write_scoreboard(pd.DataFrame([game(40, 5), game(1, 3)]))
+    before = (TODAY - datetime.timedelta(days=30)).isoformat()
+
+    # Aggregates committed but raw rows left in place, as by a crash before their removal
+    engine = scoreboard.get_engine()
+    with monkeypatch.context() as patch:
+        patch.setattr(engine, 'delete_before', crash)
+        with pytest.raises(RuntimeError):
+            scoreboard._history.compact(engine, before, scoreboard.SCOREBOARD_TOP_K)
+
+    assert scoreboard.compact(TODAY) == 0
+    assert scoreboard.get_score_counts()['count'].sum() == 2
+    assert len(scoreboard.get_scoreboard()) == 1
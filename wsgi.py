@@ -0,0 +1,10 @@
+# Production entry point: serve the Flask server behind the Dash app with a WSGI runner, e.g.
+#   gunicorn --config gunicorn.conf.py wsgi:server
+from app import app
+
+server = app.server
+
+# Dash finishes its setup on the first request and plotly imports its JSON encoder on first use.
+# Serve one request before accepting traffic, so that concurrent first requests of a threaded
+# worker cannot see a partially built callback map or a partially imported module.
+server.test_client().get('/_dash-layout')